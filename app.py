@@ -6,15 +6,29 @@ import io
 import random
 import time
 import json
+import re
+import zlib
+import hashlib
+import ast
+import fnmatch
 from fpdf import FPDF
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, send_file
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
 import docker
 import subprocess
 import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+import queue
+import heapq
+from collections import deque
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
 
 app = Flask(__name__)
 # Config
@@ -24,17 +38,93 @@ app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(hours=12)
 CONFIG_DIR = os.path.join(os.path.dirname(__file__), 'config')
 os.makedirs(CONFIG_DIR, exist_ok=True)
 DB_PATH = os.path.join(CONFIG_DIR, 'dockwatch.db')
+METRICS_DB_PATH = os.path.join(CONFIG_DIR, 'metrics.db')
+EXPORT_DIR = os.path.join(CONFIG_DIR, 'exports')
+
+# Monitoring
+MONITOR_INTERVAL = int(os.environ.get('MONITOR_INTERVAL', 30))  # seconds between sweeps
+STATS_WORKERS = int(os.environ.get('STATS_WORKERS', 16))  # parallel stats() calls per sweep
+STATS_SUBSCRIBER_BUFFER = int(os.environ.get('STATS_SUBSCRIBER_BUFFER', 10))  # samples queued per SSE viewer
+STATS_POOL_SIZE = int(os.environ.get('STATS_POOL_SIZE', 256))  # Docker connections for stats streams, one per sampled container
+STATS_ALL_INTERVAL = float(os.environ.get('STATS_ALL_INTERVAL', 2))  # seconds between /api/stats/all frames
+STATS_ALL_FULL_EVERY = int(os.environ.get('STATS_ALL_FULL_EVERY', 30))  # full snapshot every N frames
+
+# Notifications
+NOTIFY_QUEUE_SIZE = int(os.environ.get('NOTIFY_QUEUE_SIZE', 1000))  # pending notifications before drops
+NOTIFY_WORKERS = int(os.environ.get('NOTIFY_WORKERS', 2))  # concurrent deliveries per channel
+NOTIFY_RETRIES = int(os.environ.get('NOTIFY_RETRIES', 2))  # retries per channel, with exponential backoff
+NOTIFY_TIMEOUT = float(os.environ.get('NOTIFY_TIMEOUT', 3))  # seconds per HTTP attempt
+
+# Container state alerts are coalesced per window into one digest notification
+ALERT_COALESCE_WINDOW = float(os.environ.get('ALERT_COALESCE_WINDOW', 10))  # seconds, 0 disables
+ALERT_DIGEST_MAX = int(os.environ.get('ALERT_DIGEST_MAX', 20))  # lines per digest
+ALERT_COALESCE_BY = os.environ.get('ALERT_COALESCE_BY', 'container')  # 'container' or 'stack'
+
+# Threshold alert cooldowns, persisted in the database across restarts
+ALERT_COOLDOWN = int(os.environ.get('ALERT_COOLDOWN', 300))  # seconds before the same alert repeats
+ALERT_COOLDOWN_MAX = int(os.environ.get('ALERT_COOLDOWN_MAX', 10000))  # entries kept before evicting
+
+# Batched SSE log streaming (?batch=1)
+LOG_BATCH_MS = int(os.environ.get('LOG_BATCH_MS', 250))  # frame interval
+LOG_BATCH_LINES = int(os.environ.get('LOG_BATCH_LINES', 500))  # max lines per frame
+LOG_MAX_PENDING = int(os.environ.get('LOG_MAX_PENDING', 5000))  # lines buffered before dropping oldest
+LOG_MERGE_MAX_CONTAINERS = int(os.environ.get('LOG_MERGE_MAX_CONTAINERS', 50))  # per merged log stream
+
+# Server-side log search
+LOG_SEARCH_MAX_LINES = int(os.environ.get('LOG_SEARCH_MAX_LINES', 100000))  # lines scanned per search
+LOG_SEARCH_TIMEOUT = float(os.environ.get('LOG_SEARCH_TIMEOUT', 10))  # seconds a search may scan
+
+# PDF log exports
+PDF_MAX_LINES = int(os.environ.get('PDF_MAX_LINES', 20000))
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 500))
+PDF_EXPORT_WORKERS = int(os.environ.get('PDF_EXPORT_WORKERS', 2))  # PDFs rendered concurrently
+PDF_EXPORT_MAX_PENDING = int(os.environ.get('PDF_EXPORT_MAX_PENDING', 20))  # exports queued or rendering before new ones are refused
+
+# Volume usage (du inside the container) per mount
+VOLUME_CACHE_TTL = int(os.environ.get('VOLUME_CACHE_TTL', 300))  # seconds a measurement is reused
+VOLUME_DU_TIMEOUT = float(os.environ.get('VOLUME_DU_TIMEOUT', 20))  # seconds to wait per request
+VOLUME_DU_WORKERS = int(os.environ.get('VOLUME_DU_WORKERS', 4))  # du processes run at once
+
+# Disk usage (docker system df) snapshot shared by the volumes and system pages
+DF_CACHE_TTL = int(os.environ.get('DF_CACHE_TTL', 60))
+
+# Trivy vulnerability scans, run from a background queue and cached per image and DB version
+TRIVY_WORKERS = int(os.environ.get('TRIVY_WORKERS', 1))  # scans run at once
+TRIVY_QUEUE_SIZE = int(os.environ.get('TRIVY_QUEUE_SIZE', 200))  # scans waiting before new ones are refused
+TRIVY_TIMEOUT = int(os.environ.get('TRIVY_TIMEOUT', 300))  # seconds per scan
+TRIVY_NIGHTLY_HOUR = int(os.environ.get('TRIVY_NIGHTLY_HOUR', 3))  # local hour to scan all images, -1 disables
+
+# Alert history retention, applied hourly
+ALERT_HISTORY_RETENTION_DAYS = int(os.environ.get('ALERT_HISTORY_RETENTION_DAYS', 90))
+ALERT_HISTORY_MAX_ROWS = int(os.environ.get('ALERT_HISTORY_MAX_ROWS', 100000))
+
+# Prometheus /metrics: scrapers send "Authorization: Bearer <token>"; unset requires a login session
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Metrics history: (bucket seconds, retention days) per rollup tier, finest first
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 60))
+METRIC_TIERS = [
+    (60, float(os.environ.get('METRICS_RETENTION_1M_DAYS', 1))),
+    (300, float(os.environ.get('METRICS_RETENTION_5M_DAYS', 7))),
+    (3600, float(os.environ.get('METRICS_RETENTION_1H_DAYS', 90))),
+]
 
 # Docker Client
 try:
     client = docker.from_env()
+    # Stats collectors each hold a streaming connection open (the monitor samples every
+    # running container); docker-py's default pool of 10 would churn connections
+    stats_client = docker.from_env(max_pool_size=STATS_POOL_SIZE)
 except:
     client = None
+    stats_client = None
     print("Warning: Docker client not initialized.")
 
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    # WAL lets the history/config readers run while the alert writers commit
+    c.execute("PRAGMA journal_mode=WAL")
     c.execute('''CREATE TABLE IF NOT EXISTS users
                  (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password TEXT)''')
 
@@ -68,7 +158,9 @@ def init_db():
         ('telegram_chat_id', 'TEXT'),
         ('telegram_enabled', 'INTEGER DEFAULT 0'),
         ('generic_enabled', 'INTEGER DEFAULT 0'),
-        ('email_enabled', 'INTEGER DEFAULT 0')
+        ('email_enabled', 'INTEGER DEFAULT 0'),
+        ('net_limit', 'INTEGER DEFAULT 0'),
+        ('io_limit', 'INTEGER DEFAULT 0')
     ]
     
     for col_name, col_type in migrations:
@@ -140,6 +232,39 @@ def init_db():
                   level TEXT,
                   message TEXT,
                   container TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alert_history_timestamp ON alert_history (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alert_history_container ON alert_history (container, timestamp)")
+
+    # Alert Rules (evaluated on every shared stats sample, see AlertRuleEngine)
+    c.execute('''CREATE TABLE IF NOT EXISTS alert_rules
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  enabled INTEGER DEFAULT 1,
+                  container_pattern TEXT DEFAULT '*',
+                  label_selector TEXT DEFAULT '',
+                  expression TEXT NOT NULL,
+                  operator TEXT DEFAULT '>',
+                  threshold REAL NOT NULL,
+                  clear_threshold REAL,
+                  for_seconds INTEGER DEFAULT 0,
+                  level TEXT DEFAULT 'Rule',
+                  notify_recovery INTEGER DEFAULT 1)''')
+
+    # Vulnerability scan results (zlib-compressed Trivy JSON), see TrivyScanner
+    c.execute('''CREATE TABLE IF NOT EXISTS image_scans
+                 (image_id TEXT,
+                  db_version TEXT,
+                  target TEXT,
+                  scanned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                  result BLOB,
+                  PRIMARY KEY (image_id, db_version))''')
+
+    # Alert Cooldowns (see AlertCooldowns)
+    c.execute('''CREATE TABLE IF NOT EXISTS alert_cooldowns
+                 (key TEXT PRIMARY KEY,
+                  container_id TEXT,
+                  expires_at REAL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alert_cooldowns_container ON alert_cooldowns (container_id)")
     
     # Check if admin exists
     admin_user = os.environ.get('ADMIN_USERNAME', 'admin')
@@ -170,6 +295,55 @@ def init_db():
 # Initialize API and DB
 init_db()
 
+_db_local = threading.local()
+
+def get_db():
+    """Per-thread SQLite connection, reused for the lifetime of the thread.
+
+    Long-lived threads (monitor, dispatcher, event listener) stop paying a connect on
+    every call, and the busy timeout makes writers wait instead of failing with
+    "database is locked" while another thread holds the write lock.
+    """
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=10)
+        _db_local.conn = conn
+    return conn
+
+ALERTS_CONFIG_FIELDS = ('cpu_limit', 'mem_limit', 'slack_webhook', 'slack_enabled',
+                        'discord_webhook', 'discord_enabled', 'telegram_bot_token', 'telegram_chat_id',
+                        'telegram_enabled', 'generic_webhook', 'generic_enabled',
+                        'email_recipient', 'email_enabled', 'net_limit', 'io_limit')
+
+class AlertsConfigCache:
+    """In-process copy of the alerts_config row.
+
+    Invalidated when /api/alerts/config is saved; the TTL only matters when several
+    processes share the database and another one saved the change.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._config = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._config is None or time.time() - self._loaded_at > self.ttl:
+                c = get_db().cursor()
+                c.execute(f"SELECT {', '.join(ALERTS_CONFIG_FIELDS)} FROM alerts_config WHERE id=1")
+                row = c.fetchone()
+                self._config = dict(zip(ALERTS_CONFIG_FIELDS, row)) if row else {}
+                self._loaded_at = time.time()
+            return self._config
+
+    def invalidate(self):
+        with self._lock:
+            self._config = None
+
+alerts_config_cache = AlertsConfigCache()
+
 # Login Manager
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -182,11 +356,9 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = get_db().cursor()
     c.execute("SELECT * FROM users WHERE id=?", (user_id,))
     user = c.fetchone()
-    conn.close()
     if user:
         return User(id=user[0], username=user[1])
     return None
@@ -276,74 +448,320 @@ def logout():
     logout_user()
     return redirect(url_for('login'))
 
-@app.route('/')
-@login_required
-def index():
-    try:
-        if not client:
-             return render_template('index.html', containers=[])
-             
-        containers = client.containers.list(all=True)
+# --- Shared Caches ---
+class KeyedTTLCache:
+    """Values cached per key for ``ttl`` seconds, with single-flight loading.
+
+    Concurrent misses on the same key share one ``loader()`` call: the first caller
+    runs it and the others wait on its result. ``get_stale`` serves whatever value is
+    cached and refreshes expired keys in the background instead of waiting.
+
+    With ``error_ttl`` a failed load is remembered for that long: callers get the
+    same exception back instead of every request retrying the loader.
+    """
+
+    def __init__(self, ttl, max_entries=1000, executor=None, error_ttl=None):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.executor = executor
+        self._entries = {}  # key -> (value, fetched at)
+        self._errors = {}  # key -> (exception, failed at)
+        self._inflight = {}  # key -> Future of the running load
+        self._lock = threading.Lock()
+
+    def _load(self, key, loader, future):
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                if self.error_ttl:
+                    self._errors[key] = (e, time.time())
+                    if len(self._errors) > self.max_entries:
+                        del self._errors[min(self._errors, key=lambda k: self._errors[k][1])]
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._errors.pop(key, None)
+            self._entries[key] = (value, time.time())
+            if len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _start(self, key, loader, background):
+        """Future of the load for ``key``, starting one unless it is already running."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+        if background:
+            self.executor.submit(self._load, key, loader, future)
+        return future, True
+
+    def peek(self, key):
+        """(value, age in seconds) or (None, None); never loads."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        return entry[0], time.time() - entry[1]
+
+    def error(self, key):
+        """The exception of the last load of ``key`` if it failed within ``error_ttl``."""
+        entry = self._errors.get(key)
+        if entry is None or time.time() - entry[1] >= self.error_ttl:
+            return None
+        return entry[0]
+
+    def get(self, key, loader, timeout=None, refresh=False):
+        """Cached value, loading it (or joining the running load) when missing or expired."""
+        value, age = self.peek(key)
+        if age is not None and age < self.ttl and not refresh:
+            return value
+        error = None if refresh else self.error(key)
+        if error is not None:
+            raise error
+        future, leader = self._start(key, loader, background=self.executor is not None)
+        if leader and self.executor is None:
+            self._load(key, loader, future)
+        return future.result(timeout)
+
+    def fetch(self, key, loader, refresh=False):
+        """Like get, but returns a Future so several keys can load in parallel (needs an executor)."""
+        value, age = self.peek(key)
+        error = None if refresh else self.error(key)
+        if (age is not None and age < self.ttl and not refresh) or error is not None:
+            future = Future()
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+            return future
+        return self._start(key, loader, background=True)[0]
+
+    def get_stale(self, key, loader, refresh=False):
+        """(value, age) as cached, queueing a background refresh if missing or expired.
+
+        A load that failed within ``error_ttl`` is not retried; see ``error()``.
+        """
+        value, age = self.peek(key)
+        expired = age is None or age >= self.ttl
+        if refresh or (expired and self.error(key) is None):
+            self._start(key, loader, background=True)
+        return value, age
+
+    def loading(self, key):
+        return key in self._inflight
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._errors.clear()
+            else:
+                self._entries.pop(key, None)
+                self._errors.pop(key, None)
+
+# --- Container Inventory ---
+def format_uptime(started_at):
+    """Docker StartedAt timestamp -> short uptime string such as '3d 4h'."""
+    dt_str = started_at.split('.')[0] 
+    start_dt = datetime.datetime.strptime(dt_str, "%Y-%m-%dT%H:%M:%S")
+    now_dt = datetime.datetime.utcnow()
+    diff = now_dt - start_dt
+    days = diff.days
+    hours = diff.seconds // 3600
+    minutes = (diff.seconds % 3600) // 60
+    if days > 0: return f"{days}d {hours}h"
+    elif hours > 0: return f"{hours}h {minutes}m"
+    else: return f"{minutes}m"
+
+class ImageTagCache:
+    """Image ID -> repo tags, built from a single image list call.
+
+    Reading ``container.image.tags`` makes docker-py inspect the image, once per
+    container. The map is rebuilt lazily after any image event invalidates it.
+    """
+
+    def __init__(self):
+        self._tags = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        # The low-level list returns RepoTags directly; images.list() would inspect each image
+        tags = {}
+        for img in client.api.images():
+            tags[img['Id']] = [t for t in (img.get('RepoTags') or []) if t != '<none>:<none>']
+        return tags
+
+    def get(self, image_id):
+        with self._lock:
+            if self._tags is None:
+                self._tags = self._build()
+            return self._tags.get(image_id, [])
+
+    def invalidate(self):
+        with self._lock:
+            self._tags = None
+
+image_tag_cache = ImageTagCache()
+
+class ContainerInventory:
+    """In-memory container list, seeded once and kept current from the Docker events stream.
+
+    Page renders and /api/containers read from here instead of listing containers
+    on the daemon; only the container named in an event is re-inspected.
+    """
+
+    # Events that can change what the dashboard shows; exec_*, attach, top etc. are ignored
+    REFRESH_EVENTS = {'create', 'start', 'restart', 'die', 'stop', 'kill', 'pause', 'unpause',
+                      'rename', 'update', 'oom'}
+
+    def __init__(self):
+        self._containers = {}
+        self._lock = threading.Lock()
+        self.seeded = False
+
+    def _summarize(self, c):
+        name = c.name
+        if name.startswith('/'):
+            name = name[1:]
+        
+        # Ports
+        ports_list = []
+        ports_data = c.attrs.get('NetworkSettings', {}).get('Ports', {})
+        if ports_data:
+            for int_port, bindings in ports_data.items():
+                if bindings:
+                    for b in bindings:
+                        host_port = b.get('HostPort', '')
+                        ports_list.append(f"{host_port}:{int_port}")
+                else:
+                    ports_list.append(f"{int_port}")
+
+        return {
+            'id': c.id,
+            'name': name,
+            'image_id': c.attrs.get('Image', ''),
+            'status': c.status,
+            'started_at': c.attrs.get('State', {}).get('StartedAt'),
+            'labels': c.attrs.get('Config', {}).get('Labels') or {},
+            'ports': ", ".join(ports_list)
+        }
+
+    def seed(self):
+        containers = {c.id: self._summarize(c) for c in client.containers.list(all=True)}
+        with self._lock:
+            self._containers = containers
+            self.seeded = True
+
+    def refresh(self, container_id):
+        try:
+            summary = self._summarize(client.containers.get(container_id))
+        except docker.errors.NotFound:
+            self.remove(container_id)
+            return
+        with self._lock:
+            self._containers[summary['id']] = summary
+
+    def remove(self, container_id):
+        with self._lock:
+            self._containers.pop(container_id, None)
+
+    def handle_event(self, event):
+        action = event.get('Action') or event.get('status') or ''
+        container_id = event.get('id') or event.get('Actor', {}).get('ID')
+        if not container_id:
+            return
+        if action == 'destroy':
+            self.remove(container_id)
+        elif action in self.REFRESH_EVENTS:
+            self.refresh(container_id)
+
+    def get(self, container_id):
+        with self._lock:
+            return self._containers.get(container_id)
+
+    def running(self):
+        with self._lock:
+            return [dict(c) for c in self._containers.values() if c['status'] == 'running']
+
+    def image_usage(self):
+        """Image ID -> names of the containers (running or not) created from it."""
+        usage = {}
+        with self._lock:
+            for c in self._containers.values():
+                usage.setdefault(c['image_id'], []).append(c['name'])
+        return usage
+
+    def rows(self):
+        """Dashboard rows; uptime is derived at render time so cached entries never go stale."""
+        with self._lock:
+            containers = list(self._containers.values())
         container_list = []
         for c in containers:
-            name = c.name
-            if name.startswith('/'):
-                name = name[1:]
-            
-            image_tag = "unknown"
-            if hasattr(c, 'image') and hasattr(c.image, 'tags') and len(c.image.tags) > 0:
-                image_tag = c.image.tags[0]
-            
-            # Ports
-            ports_list = []
-            ports_data = c.attrs.get('NetworkSettings', {}).get('Ports', {})
-            if ports_data:
-                for int_port, bindings in ports_data.items():
-                    if bindings:
-                        for b in bindings:
-                            host_port = b.get('HostPort', '')
-                            ports_list.append(f"{host_port}:{int_port}")
-                    else:
-                        ports_list.append(f"{int_port}")
-            ports_str = ", ".join(ports_list)
-
             # Calculate Uptime
             uptime_str = "Unknown"
-            status_text = c.status
+            status_text = c['status']
             
-            if c.status == 'running':
-                 started_at = c.attrs.get('State', {}).get('StartedAt')
-                 if started_at:
+            if c['status'] == 'running':
+                 if c['started_at']:
                      try:
-                         dt_str = started_at.split('.')[0] 
-                         start_dt = datetime.datetime.strptime(dt_str, "%Y-%m-%dT%H:%M:%S")
-                         now_dt = datetime.datetime.utcnow()
-                         diff = now_dt - start_dt
-                         days = diff.days
-                         hours = diff.seconds // 3600
-                         minutes = (diff.seconds % 3600) // 60
-                         if days > 0: uptime_str = f"{days}d {hours}h"
-                         elif hours > 0: uptime_str = f"{hours}h {minutes}m"
-                         else: uptime_str = f"{minutes}m"
+                         uptime_str = format_uptime(c['started_at'])
                          status_text = f"Up {uptime_str}"
                      except: pass
             else:
-                 status_text = c.status.capitalize()
+                 status_text = c['status'].capitalize()
+
+            image_tag = "unknown"
+            tags = image_tag_cache.get(c['image_id'])
+            if tags:
+                image_tag = tags[0]
 
             container_list.append({
-                "ID": c.id[:12],
-                "Names": name, 
+                "ID": c['id'][:12],
+                "Names": c['name'], 
                 "Image": image_tag,
-                "State": c.status,
+                "State": c['status'],
                 "StatusText": status_text,
-                "Ports": ports_str,
+                "Ports": c['ports'],
                 "Uptime": uptime_str
             })
-        return render_template('index.html', containers=container_list)
+        return container_list
+
+container_inventory = ContainerInventory()
+
+def get_container_rows():
+    if not container_inventory.seeded:
+        # Events listener not connected yet; seed on demand
+        container_inventory.seed()
+    return container_inventory.rows()
+
+@app.route('/')
+@login_required
+def index():
+    try:
+        if not client:
+             return render_template('index.html', containers=[])
+             
+        return render_template('index.html', containers=get_container_rows())
     except Exception as e:
         print(f"Error fetching containers: {e}")
         return render_template('index.html', containers=[])
 
+@app.route('/api/containers')
+@login_required
+def list_containers():
+    if not client:
+        return jsonify([])
+    try:
+        return jsonify(get_container_rows())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/images_view')
 @login_required
 def images_view_page():
@@ -359,76 +777,479 @@ def system_view_page():
 def alerts_view_page():
     return render_template('alerts.html')
 
+# --- SSE Streams ---
+class StreamCounter:
+    """Open and total SSE connections per stream type, exported on /metrics."""
+
+    def __init__(self):
+        self.open = {}
+        self.total = {}
+        self._lock = threading.Lock()
+
+    def counted(self, kind, stream):
+        """Wrap a response generator so it is counted while the client is connected."""
+        with self._lock:
+            self.open[kind] = self.open.get(kind, 0) + 1
+            self.total[kind] = self.total.get(kind, 0) + 1
+        try:
+            yield from stream
+        finally:
+            with self._lock:
+                self.open[kind] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.open), dict(self.total)
+
+sse_clients = StreamCounter()
+
+# --- Log Helpers ---
+def parse_log_time(value):
+    """since/until query value: unix timestamp or ISO 8601 datetime, after the epoch."""
+    try:
+        ts = int(float(value))
+    except ValueError:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.timestamp() <= 0:
+            raise ValueError(f"time must be after 1970-01-01: {value!r}")
+        return parsed
+    if ts <= 0:
+        raise ValueError(f"timestamp must be positive: {value!r}")
+    return ts
+
+def log_window_args():
+    """Docker logs() kwargs for the since/until/tail query parameters."""
+    kwargs = {}
+    for key in ('since', 'until'):
+        if request.args.get(key):
+            kwargs[key] = parse_log_time(request.args[key])
+    tail = request.args.get('tail')
+    if tail and tail != 'all':
+        kwargs['tail'] = int(tail)
+        if kwargs['tail'] < 0:
+            raise ValueError(f"tail must not be negative: {tail!r}")
+    return kwargs
+
+def iter_log_lines(chunks):
+    """Re-split a Docker log stream into lines; frames are not guaranteed to end on one."""
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8', errors='replace')
+    if pending:
+        yield pending.decode('utf-8', errors='replace')
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+class LogBuffer:
+    """Bounded line buffer between a log reader thread and an SSE generator.
+
+    When the client can't keep up, the oldest lines are discarded and counted
+    instead of letting memory grow or blocking the reader.
+    """
+
+    def __init__(self, max_pending, readers=1):
+        self.max_pending = max_pending
+        self.readers = readers  # closed once every reader has finished
+        self.lines = deque()
+        self.dropped = 0
+        self.closed = False
+        self.wanted = 1
+        self.cond = threading.Condition()
+
+    def put(self, line):
+        with self.cond:
+            if len(self.lines) >= self.max_pending:
+                self.lines.popleft()
+                self.dropped += 1
+            self.lines.append(line)
+            if len(self.lines) >= self.wanted:
+                self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.readers -= 1
+            if self.readers <= 0:
+                self.closed = True
+                self.cond.notify()
+
+    def take(self, max_lines, timeout):
+        """Wait up to ``timeout`` for ``max_lines`` lines; returns (lines, dropped, closed)."""
+        with self.cond:
+            if len(self.lines) < max_lines and not self.closed:
+                self.wanted = max_lines
+                self.cond.wait(timeout)
+            n = min(max_lines, len(self.lines))
+            lines = [self.lines.popleft() for _ in range(n)]
+            return lines, self.dropped, self.closed and not self.lines
+
+def pump_log_lines(log_stream, buffer):
+    try:
+        for line in iter_log_lines(log_stream):
+            buffer.put(line.replace('\r', ''))
+    except Exception:
+        pass  # stream closed by the consumer or the container went away
+    finally:
+        buffer.close()
+
+def log_sort_key(timestamp):
+    """Sortable key for a Docker RFC3339Nano timestamp (trailing zeros are trimmed by Docker)."""
+    base, _, fraction = timestamp.rstrip('Z').partition('.')
+    return base + '.' + fraction.ljust(9, '0')
+
+def pump_tagged_log_lines(log_stream, buffer, source):
+    """Like pump_log_lines for a timestamps=True stream; buffers (timestamp, source, text)."""
+    try:
+        for line in iter_log_lines(log_stream):
+            timestamp, _, text = line.partition(' ')
+            buffer.put((timestamp, source, text.replace('\r', '')))
+    except Exception:
+        pass
+    finally:
+        buffer.close()
+
+def sse_log_batches(buffer, batch_lines, batch_interval, keepalive=15):
+    """SSE frames of up to ``batch_lines`` lines (one data: field per line) every ``batch_interval``."""
+    reported = 0
+    idle_since = time.time()
+    while True:
+        lines, dropped, closed = buffer.take(batch_lines, batch_interval)
+        if dropped > reported:
+            yield f"event: dropped\ndata: {json.dumps({'dropped': dropped, 'new': dropped - reported})}\n\n"
+            reported = dropped
+        if lines:
+            yield f"id: {time.time()}\n" + "".join(f"data: {line}\n" for line in lines) + "\n"
+            idle_since = time.time()
+        elif closed:
+            return
+        elif time.time() - idle_since > keepalive:
+            yield ": keepalive\n\n"
+            idle_since = time.time()
+
 @app.route('/api/export/<container_id>')
 @login_required
 def export_logs(container_id):
+    """Export logs as txt, json, ndjson or pdf.
+
+    Large PDFs should go through the background job (POST /api/export/<id>/pdf).
+    txt/json/ndjson stream straight from the Docker log stream, so memory use does not
+    grow with log size. Supports since/until/tail, and gzip when the client accepts it.
+    """
+    try:
+        window = log_window_args()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+
     try:
         format_type = request.args.get('format', 'txt')
         container = client.containers.get(container_id)
-        logs = container.logs().decode('utf-8', errors='replace')
         name = container.name.replace('/', '')
 
-        if format_type == 'json':
-            return jsonify({"container": name, "logs": logs.split('\n')})
-            
-        elif format_type == 'pdf':
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=10)
-            
-            # Simple header
-            pdf.cell(200, 10, txt=f"Logs for container: {name}", ln=1, align='C')
-            pdf.ln(10)
-            
-            # Add logs line by line
-            # FPDF unicode support is limited in standard font, strip non-latin1 for simplicity
-            for line in logs.split('\n'):
-                # clean line
-                clean_line = line.encode('latin-1', 'replace').decode('latin-1')
-                pdf.multi_cell(0, 5, txt=clean_line)
-                
+        if format_type == 'pdf':
+            # Synchronous variant for small exports; same line/page caps as the background job
+            lines, truncated = read_pdf_log_lines(container, window)
+            pdf, _ = render_logs_pdf(name, lines, truncated)
             response = Response(pdf.output(dest='S').encode('latin-1'), mimetype='application/pdf')
             response.headers['Content-Disposition'] = f'attachment; filename={name}.pdf'
             return response
-            
+
+        log_stream = container.logs(stream=True, follow=False, **window)
+
+        if format_type == 'json':
+            def generate():
+                yield '{"container": ' + json.dumps(name) + ', "logs": ['
+                for i, line in enumerate(iter_log_lines(log_stream)):
+                    yield (', ' if i else '') + json.dumps(line)
+                yield ']}'
+            mimetype, ext = 'application/json', 'json'
+
+        elif format_type == 'ndjson':
+            def generate():
+                for line in iter_log_lines(log_stream):
+                    yield json.dumps({'container': name, 'log': line}) + '\n'
+            mimetype, ext = 'application/x-ndjson', 'ndjson'
+
         else: # txt default
-            return Response(logs, mimetype='text/plain', 
-                           headers={"Content-Disposition": f"attachment;filename={name}.txt"})
+            def generate():
+                for chunk in log_stream:
+                    yield chunk
+            mimetype, ext = 'text/plain', 'txt'
+
+        body = generate()
+        headers = {"Content-Disposition": f"attachment;filename={name}.{ext}"}
+        if request.args.get('gzip', '1') != '0' and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = gzip_stream(body)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
                            
     except Exception as e:
         return f"Error exporting logs: {str(e)}", 500
 
+# --- PDF Export Jobs ---
+def read_pdf_log_lines(container, window):
+    """Log lines for a PDF export, capped at PDF_MAX_LINES.
+
+    Without since/tail only the newest PDF_MAX_LINES lines are taken; otherwise the
+    stream is read until the cap. Returns (lines, truncated).
+    """
+    window = dict(window)
+    if 'tail' in window:
+        window['tail'] = min(window['tail'], PDF_MAX_LINES)
+    elif 'since' not in window:
+        window['tail'] = PDF_MAX_LINES
+    lines = []
+    truncated = False
+    log_stream = container.logs(stream=True, follow=False, **window)
+    for line in iter_log_lines(log_stream):
+        if len(lines) >= PDF_MAX_LINES:
+            truncated = True
+            break
+        lines.append(line)
+    if hasattr(log_stream, 'close'):
+        log_stream.close()
+    return lines, truncated
+
+def render_logs_pdf(name, lines, truncated=False, progress=None):
+    """Lay out log lines into an FPDF document, stopping at PDF_MAX_PAGES.
+
+    Returns (pdf, truncated). ``progress`` is called with the fraction done.
+    """
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=10)
+    
+    # Simple header
+    pdf.cell(200, 10, txt=f"Logs for container: {name}", ln=1, align='C')
+    pdf.ln(10)
+    
+    # Add logs line by line
+    # FPDF unicode support is limited in standard font, strip non-latin1 for simplicity
+    total = len(lines) or 1
+    for i, line in enumerate(lines):
+        if pdf.page_no() >= PDF_MAX_PAGES:
+            truncated = True
+            break
+        # clean line
+        clean_line = line.encode('latin-1', 'replace').decode('latin-1')
+        pdf.multi_cell(0, 5, txt=clean_line)
+        if i % 500 == 0:
+            if progress:
+                progress(i / total)
+            time.sleep(0)  # let other greenlets run when served by gevent
+
+    if truncated:
+        pdf.ln(5)
+        pdf.multi_cell(0, 5, txt=f"[Export truncated: limits are {PDF_MAX_LINES} lines / {PDF_MAX_PAGES} pages]")
+    return pdf, truncated
+
+class PdfExportJobs:
+    """Renders PDF log exports in the background and keeps the files until they expire."""
+
+    def __init__(self, directory, workers=2, ttl=3600, max_pending=20):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-export')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, container, window):
+        """Queue an export; returns the job, or None when max_pending exports are unfinished."""
+        self._expire()
+        name = container.name.replace('/', '')
+        job = {
+            'id': secrets.token_hex(8),
+            'container': name,
+            'status': 'queued',
+            'progress': 0,
+            'lines': 0,
+            'truncated': False,
+            'error': None,
+            'created': time.time()
+        }
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if j['status'] in ('queued', 'running')) >= self.max_pending:
+                return None
+            self._jobs[job['id']] = job
+        self.pool.submit(self._run, job, container, window)
+        return dict(job)
+
+    def _run(self, job, container, window):
+        job['status'] = 'running'
+        try:
+            lines, truncated = read_pdf_log_lines(container, window)
+            job['lines'] = len(lines)
+            job['progress'] = 10
+
+            def progress(fraction):
+                job['progress'] = 10 + int(fraction * 85)
+
+            pdf, truncated = render_logs_pdf(job['container'], lines, truncated, progress)
+            del lines
+            path = os.path.join(self.directory, f"{job['id']}.pdf")
+            pdf.output(path, 'F')
+            job.update({'path': path, 'truncated': truncated, 'progress': 100, 'status': 'done'})
+        except Exception as e:
+            job.update({'status': 'error', 'error': str(e)})
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j['created'] < cutoff and j['status'] in ('done', 'error')]
+            for job in expired:
+                del self._jobs[job['id']]
+        for job in expired:
+            if job.get('path') and os.path.exists(job['path']):
+                os.remove(job['path'])
+
+    def sweep(self):
+        """Expire finished jobs and delete any export file older than the TTL.
+
+        Catches files left by a previous run or by jobs nobody submitted after,
+        which submit-time expiry never sees.
+        """
+        self._expire()
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+
+pdf_exports = PdfExportJobs(EXPORT_DIR, workers=PDF_EXPORT_WORKERS, max_pending=PDF_EXPORT_MAX_PENDING)
+
+def public_job(job):
+    return {k: v for k, v in job.items() if k != 'path'}
+
+@app.route('/api/export/<container_id>/pdf', methods=['POST'])
+@login_required
+def start_pdf_export(container_id):
+    """Queue a PDF export; accepts the same since/until/tail parameters as export_logs."""
+    try:
+        window = log_window_args()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+
+    try:
+        container = client.containers.get(container_id)
+        job = pdf_exports.submit(container, window)
+        if job is None:
+            return jsonify({'error': 'Too many PDF exports in progress, try again later'}), 503
+        return jsonify(public_job(job)), 202
+    except docker.errors.NotFound:
+        return jsonify({'error': f'Container {container_id} not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/export/jobs/<job_id>')
+@login_required
+def pdf_export_status(job_id):
+    job = pdf_exports.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown or expired export job'}), 404
+    return jsonify(public_job(job))
+
+@app.route('/api/export/jobs/<job_id>/download')
+@login_required
+def pdf_export_download(job_id):
+    job = pdf_exports.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown or expired export job'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': 'Export not finished', 'status': job['status']}), 409
+    return send_file(job['path'], mimetype='application/pdf', as_attachment=True,
+                     download_name=f"{job['container']}.pdf")
+
+# --- Volume Usage ---
+def measure_mount(container, dest):
+    """Size of one mount in KB, measured with du inside the container."""
+    exit_code, output = container.exec_run(['du', '-sk', dest])
+    # Output example: b'10500\t/var/lib/mysql\n'
+    out_str = output.decode('utf-8', errors='replace').strip()
+    if exit_code != 0 or not out_str:
+        raise RuntimeError(out_str.splitlines()[-1] if out_str else f"du exited with {exit_code}")
+    return int(out_str.splitlines()[-1].split()[0])
+
+# du walks the whole mount inside the production container, so measurements are
+# cached per mount, run on a small shared pool, and never run twice at once.
+# Failures (no du in distroless images, permission errors) are cached as long as sizes.
+volume_sizes = KeyedTTLCache(VOLUME_CACHE_TTL, max_entries=5000, error_ttl=VOLUME_CACHE_TTL,
+                             executor=ThreadPoolExecutor(max_workers=VOLUME_DU_WORKERS, thread_name_prefix='du'))
+
 @app.route('/api/volume/<container_id>')
 @login_required
 def volume_usage(container_id):
+    """Disk usage of a container's mounts.
+
+    Mounts are measured in parallel and cached for VOLUME_CACHE_TTL seconds. By default
+    the request waits up to VOLUME_DU_TIMEOUT for fresh values; ?async=1 returns the
+    last known values at once (``pending`` where none exists yet) and refreshes
+    expired ones in the background. ?refresh=1 forces a new measurement (a mount
+    already being measured is not measured twice).
+    """
+    async_mode = request.args.get('async') == '1'
+    refresh = request.args.get('refresh') == '1'
     try:
         container = client.containers.get(container_id)
         if container.status != 'running':
             return jsonify({'status': 'stopped', 'total_mb': 0, 'mounts': []})
 
-        mounts = container.attrs.get('Mounts', [])
+        mounts = [m['Destination'] for m in container.attrs.get('Mounts', [])]
+        keys = {dest: (container.id, dest) for dest in mounts}
+
+        results = {}
+        if async_mode:
+            for dest, key in keys.items():
+                results[dest] = volume_sizes.get_stale(key, lambda dest=dest: measure_mount(container, dest), refresh)
+                error = volume_sizes.error(key)
+                if results[dest][0] is None and error is not None and not volume_sizes.loading(key):
+                    results[dest] = error
+        else:
+            futures = {dest: volume_sizes.fetch(key, lambda dest=dest: measure_mount(container, dest), refresh)
+                       for dest, key in keys.items()}
+            deadline = time.time() + VOLUME_DU_TIMEOUT
+            for dest, future in futures.items():
+                try:
+                    future.result(max(0, deadline - time.time()))
+                except FutureTimeout:
+                    pass  # still running; reported as pending or with its last value
+                except Exception as e:
+                    results[dest] = e
+            for dest, key in keys.items():
+                if dest not in results:
+                    results[dest] = volume_sizes.peek(key)
+
         usage_data = []
         total_kb = 0
-        
-        for mount in mounts:
-            dest = mount['Destination']
-            # Try du -sk (kilobytes) which is widely supported
-            try:
-                # exec_run returns (exit_code, output)
-                # We use simple string splitting
-                cmd = f"du -sk {dest}"
-                exit_code, output = container.exec_run(cmd)
-                if exit_code == 0:
-                    # Output example: b'10500\t/var/lib/mysql\n'
-                    out_str = output.decode('utf-8').strip()
-                    if out_str:
-                        size_kb = int(out_str.split()[0])
-                        total_kb += size_kb
-                        usage_data.append({'path': dest, 'size_mb': round(size_kb/1024, 2)})
-            except Exception as e:
+        for dest, result in results.items():
+            entry = {'path': dest}
+            if isinstance(result, Exception):
                 # Sometimes exec fails or permission denied
-                usage_data.append({'path': dest, 'error': str(e)})
-        
+                entry['error'] = str(result)
+            else:
+                size_kb, age = result
+                if size_kb is None:
+                    entry['pending'] = True
+                else:
+                    total_kb += size_kb
+                    entry['size_mb'] = round(size_kb / 1024, 2)
+                    entry['age'] = round(age, 1)
+                    if age >= VOLUME_CACHE_TTL or volume_sizes.loading(keys[dest]):
+                        entry['refreshing'] = True
+            usage_data.append(entry)
+
         return jsonify({
             'status': 'success',
             'total_mb': round(total_kb / 1024, 2),
@@ -437,11 +1258,320 @@ def volume_usage(container_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- Shared Stats Collection ---
+def parse_docker_time(value):
+    """Docker RFC3339Nano timestamp -> unix time (None for Docker's zero time)."""
+    if not value or value.startswith('0001-'):
+        return None
+    base, _, fraction = value.rstrip('Z').partition('.')
+    dt = datetime.datetime.strptime(base, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp() + (float('0.' + fraction[:9]) if fraction else 0.0)
+
+def io_totals(stat):
+    """Cumulative (rx, tx, read, write) bytes across all interfaces and block devices."""
+    # Network (Sum all interfaces)
+    rx_bytes = 0
+    tx_bytes = 0
+    for iface in (stat.get('networks') or {}).values():
+        rx_bytes += iface.get('rx_bytes', 0)
+        tx_bytes += iface.get('tx_bytes', 0)
+
+    # Disk IO
+    # blkio_stats -> io_service_bytes_recursive
+    disk_read = 0
+    disk_write = 0
+    for entry in (stat.get('blkio_stats', {}).get('io_service_bytes_recursive') or []):
+        op = entry.get('op', '').lower()
+        if 'read' in op:
+            disk_read += entry.get('value', 0)
+        elif 'write' in op:
+            disk_write += entry.get('value', 0)
+    return rx_bytes, tx_bytes, disk_read, disk_write
+
+def calculate_stats(stat, prev=None):
+    """Turn a raw Docker stats sample into the metrics shown in the UI and used for alerts.
+
+    With the previous raw sample of the same stream, network and disk rates (bytes/s)
+    are derived from the counter deltas over the samples' ``read`` timestamps.
+    """
+    cpu_stats = stat.get('cpu_stats', {})
+    precpu_stats = stat.get('precpu_stats', {})
+
+    cpu_percent = 0.0
+    system_usage = cpu_stats.get('system_cpu_usage', 0) or 0
+    presystem_usage = precpu_stats.get('system_cpu_usage', 0) or 0
+    # The first sample of a stream has no precpu data, which would report a bogus spike
+    if system_usage > 0 and presystem_usage > 0:
+        cpu_delta = cpu_stats.get('cpu_usage', {}).get('total_usage', 0) - \
+                    precpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+        system_delta = system_usage - presystem_usage
+        if system_delta > 0 and cpu_delta > 0:
+            online_cpus = cpu_stats.get('online_cpus', 1) or 1
+            cpu_percent = (cpu_delta / system_delta) * online_cpus * 100.0
+
+    # Memory
+    mem_usage = stat.get('memory_stats', {}).get('usage', 0) or 0
+    mem_limit = stat.get('memory_stats', {}).get('limit', 0) or 0
+    mem_percent = 0.0
+    if mem_limit > 0:
+        mem_percent = (mem_usage / mem_limit) * 100.0
+
+    rx_bytes, tx_bytes, disk_read, disk_write = io_totals(stat)
+
+    rates = [0, 0, 0, 0]
+    if prev is not None:
+        now_ts = parse_docker_time(stat.get('read'))
+        prev_ts = parse_docker_time(prev.get('read'))
+        if now_ts and prev_ts and now_ts > prev_ts:
+            elapsed = now_ts - prev_ts
+            current = (rx_bytes, tx_bytes, disk_read, disk_write)
+            # Counters reset on container restart; clamp to 0 rather than go negative
+            rates = [max(0, int((cur - old) / elapsed)) for cur, old in zip(current, io_totals(prev))]
+
+    return {
+        "cpu": round(cpu_percent, 2),
+        "memory": round(mem_usage / 1024 / 1024, 2), # MB
+        "memory_limit": round(mem_limit / 1024 / 1024, 2), # MB
+        "mem_percent": round(mem_percent, 2),
+        "net_rx": round(rx_bytes / 1024 / 1024, 2), # MB
+        "net_tx": round(tx_bytes / 1024 / 1024, 2), # MB
+        "disk_read": round(disk_read / 1024 / 1024, 2), # MB
+        "disk_write": round(disk_write / 1024 / 1024, 2), # MB
+        # Unrounded counters for /metrics; the MB fields above lose anything under 10 KB
+        "memory_bytes": mem_usage,
+        "memory_limit_bytes": mem_limit,
+        "net_rx_bytes": rx_bytes,
+        "net_tx_bytes": tx_bytes,
+        "disk_read_bytes": disk_read,
+        "disk_write_bytes": disk_write,
+        "net_rx_rate": rates[0], # bytes/s
+        "net_tx_rate": rates[1], # bytes/s
+        "disk_read_rate": rates[2], # bytes/s
+        "disk_write_rate": rates[3], # bytes/s
+        "timestamp": datetime.datetime.now().strftime('%H:%M:%S'),
+        "time": time.time()
+    }
+
+class StatsCollector:
+    """Reads one container's stats stream and fans every sample out to its subscribers."""
+
+    def __init__(self, hub, container_id, name=None):
+        self.hub = hub
+        self.container_id = container_id
+        self.name = name  # used as the metrics history key, stable across recreates
+        self.subscribers = set()
+        self.pins = set()  # owners keeping it alive without SSE viewers ('monitor', 'all')
+        self.stopped = False
+        self.latest = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            prev = None
+            for stat in stats_client.api.stats(self.container_id, stream=True, decode=True):
+                if self.stopped:
+                    break
+                self.hub._publish(self, calculate_stats(stat, prev))
+                prev = stat
+        except Exception as e:
+            print(f"Stats collector error ({self.container_id[:12]}): {e}")
+        finally:
+            self.hub._finish(self)
+
+class StatsHub:
+    """One stats stream per container, shared by every SSE viewer and the monitor."""
+
+    def __init__(self, buffer_size=10):
+        self.buffer_size = buffer_size
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _get_or_start(self, container_id, name=None):
+        collector = self._collectors.get(container_id)
+        if collector is None or collector.stopped:
+            collector = StatsCollector(self, container_id, name)
+            self._collectors[container_id] = collector
+            collector.thread.start()
+        elif name and not collector.name:
+            collector.name = name
+        return collector
+
+    def subscribe(self, container_id, name=None):
+        q = queue.Queue(maxsize=self.buffer_size)
+        with self._lock:
+            collector = self._get_or_start(container_id, name)
+            collector.subscribers.add(q)
+            if collector.latest is not None:
+                q.put_nowait(collector.latest)
+        return q
+
+    def unsubscribe(self, container_id, q):
+        with self._lock:
+            collector = self._collectors.get(container_id)
+            if collector is None:
+                return
+            collector.subscribers.discard(q)
+            if not collector.subscribers and not collector.pins:
+                # The thread exits on its next sample
+                collector.stopped = True
+
+    def track(self, containers, owner='monitor'):
+        """Pin collectors for exactly these containers on behalf of ``owner``.
+
+        ``containers`` maps container id to container name; collectors no longer
+        wanted by any owner or viewer are stopped.
+        """
+        wanted = set(containers)
+        with self._lock:
+            for cid, name in containers.items():
+                self._get_or_start(cid, name).pins.add(owner)
+            for cid, collector in self._collectors.items():
+                if cid not in wanted and owner in collector.pins:
+                    collector.pins.discard(owner)
+                    if not collector.subscribers and not collector.pins:
+                        collector.stopped = True
+
+    def latest(self, container_id, max_age=None):
+        collector = self._collectors.get(container_id)
+        sample = collector.latest if collector else None
+        if sample is None or (max_age is not None and time.time() - sample['time'] > max_age):
+            return None
+        return sample
+
+    def snapshot(self):
+        """(name, latest sample) of every live collector, keyed by container id."""
+        with self._lock:
+            return {cid: (c.name, c.latest) for cid, c in self._collectors.items()
+                    if c.latest is not None and not c.stopped}
+
+    def _publish(self, collector, sample):
+        collector.latest = sample
+        if 'monitor' in collector.pins and collector.name:
+            # Only the monitor owner process pins for 'monitor', so each container is
+            # recorded once even when other processes run collectors for their viewers
+            metrics_store.add(collector.name, sample)
+            alert_rules.observe(collector.container_id, collector.name, sample)
+        with self._lock:
+            subscribers = list(collector.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(sample)
+            except queue.Full:
+                # Slow viewer: drop its oldest sample rather than block the collector
+                try:
+                    q.get_nowait()
+                    q.put_nowait(sample)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _finish(self, collector):
+        with self._lock:
+            collector.stopped = True
+            current = self._collectors.get(collector.container_id) is collector
+            if current:
+                del self._collectors[collector.container_id]
+            subscribers = list(collector.subscribers)
+        if current:
+            # A replacement collector owns the rule state now; don't wipe what it built up
+            alert_rules.forget(collector.container_id)
+        # None tells subscribers the stream has ended (container stopped or removed)
+        for q in subscribers:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+stats_hub = StatsHub(buffer_size=STATS_SUBSCRIBER_BUFFER)
+
+class AllStatsWatchers:
+    """Counts /api/stats/all streams; while any are open every running container is sampled."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def tick(self):
+        if not container_inventory.seeded:
+            container_inventory.seed()
+        stats_hub.track({c['id']: c['name'] for c in container_inventory.running()}, owner='all')
+
+    def __enter__(self):
+        with self._lock:
+            self.count += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.count -= 1
+            if self.count == 0:
+                stats_hub.track({}, owner='all')
+
+all_stats_watchers = AllStatsWatchers()
+
+# Order of the per-container values in /api/stats/all frames
+ALL_STATS_FIELDS = ['cpu', 'memory', 'mem_percent', 'net_rx_rate', 'net_tx_rate', 'disk_read_rate', 'disk_write_rate']
+
+@app.route('/api/stats/all')
+@login_required
+def stream_all_stats():
+    """Live utilisation of every running container in one SSE stream.
+
+    Each frame maps 12-char container ids to value arrays ordered as ``fields``
+    (rates in bytes/s). The first frame and every STATS_ALL_FULL_EVERY-th one are
+    full snapshots (with names); the others only carry changed containers plus
+    ``removed`` ids.
+    """
+    if not client:
+        return "Docker client not initialized", 500
+
+    def generate():
+        with all_stats_watchers:
+            sent = {}
+            tick = 0
+            while True:
+                all_stats_watchers.tick()
+                current = {}
+                names = {}
+                for cid, (name, sample) in stats_hub.snapshot().items():
+                    current[cid[:12]] = [sample[f] for f in ALL_STATS_FIELDS]
+                    names[cid[:12]] = name
+                if tick % STATS_ALL_FULL_EVERY == 0:
+                    frame = {'t': time.time(), 'full': True, 'fields': ALL_STATS_FIELDS,
+                             'names': names, 'c': current}
+                else:
+                    frame = {'t': time.time(),
+                             'c': {cid: v for cid, v in current.items() if sent.get(cid) != v},
+                             'removed': [cid for cid in sent if cid not in current]}
+                    new_names = {cid: names[cid] for cid in frame['c'] if cid not in sent}
+                    if new_names:
+                        frame['names'] = new_names
+                sent = current
+                tick += 1
+                yield f"data: {json.dumps(frame, separators=(',', ':'))}\n\n"
+                time.sleep(STATS_ALL_INTERVAL)
+
+    return Response(stream_with_context(sse_clients.counted('stats_all', generate())), mimetype='text/event-stream')
+
+RATE_FIELDS = ('net_rx_rate', 'net_tx_rate', 'disk_read_rate', 'disk_write_rate')
+
 @app.route('/api/stats/<container_id>')
 @login_required
 def stream_stats(container_id):
+    """Live stats for one container over SSE.
+
+    net_*/disk_* are cumulative MB; the *_rate fields are bytes/s. ?interval=N sends
+    one frame every N seconds with rates averaged over the samples in between.
+    """
     if not client:
         return "Docker client not initialized", 500
+    try:
+        interval = max(0.0, float(request.args.get('interval', 0)))
+    except ValueError:
+        return "interval must be a number", 400
 
     def generate():
         try:
@@ -450,76 +1580,224 @@ def stream_stats(container_id):
                  yield f"data: {json.dumps({'error': 'Container excluded'})}\n\n"
                  return
 
-            # Keep track of previous network/disk values to calculate rate/speed if needed
-            # For now, we stream raw cumulative values or calculated usage
-            for stat in container.stats(stream=True, decode=True):
-                # Calculations
-                cpu_delta = stat.get('cpu_stats', {}).get('cpu_usage', {}).get('total_usage', 0) - \
-                            stat.get('precpu_stats', {}).get('cpu_usage', {}).get('total_usage', 0)
-                system_delta = stat.get('cpu_stats', {}).get('system_cpu_usage', 0) - \
-                               stat.get('precpu_stats', {}).get('system_cpu_usage', 0)
-                
-                online_cpus = stat.get('cpu_stats', {}).get('online_cpus', 1)
-                if online_cpus is None: online_cpus = 1
-                
-                cpu_percent = 0.0
-                if system_delta > 0 and cpu_delta > 0:
-                    cpu_percent = (cpu_delta / system_delta) * online_cpus * 100.0
-
-                # Memory
-                mem_usage = stat.get('memory_stats', {}).get('usage', 0)
-                mem_limit = stat.get('memory_stats', {}).get('limit', 0)
-                mem_percent = 0.0
-                if mem_limit > 0:
-                    mem_percent = (mem_usage / mem_limit) * 100.0
-                
-                # Network (Sum all interfaces)
-                networks = stat.get('networks', {})
-                rx_bytes = 0
-                tx_bytes = 0
-                if networks:
-                    for iface in networks.values():
-                        rx_bytes += iface.get('rx_bytes', 0)
-                        tx_bytes += iface.get('tx_bytes', 0)
-                
-                # Disk IO
-                # blkio_stats -> io_service_bytes_recursive
-                blkio = stat.get('blkio_stats', {}).get('io_service_bytes_recursive', [])
-                disk_read = 0
-                disk_write = 0
-                if blkio:
-                    for entry in blkio:
-                        op = entry.get('op', '').lower()
-                        if 'read' in op:
-                            disk_read += entry.get('value', 0)
-                        elif 'write' in op:
-                            disk_write += entry.get('value', 0)
-
-                data = {
-                    "cpu": round(cpu_percent, 2),
-                    "memory": round(mem_usage / 1024 / 1024, 2), # MB
-                    "memory_limit": round(mem_limit / 1024 / 1024, 2), # MB
-                    "net_rx": round(rx_bytes / 1024 / 1024, 2), # MB
-                    "net_tx": round(tx_bytes / 1024 / 1024, 2), # MB
-                    "disk_read": round(disk_read / 1024 / 1024, 2), # MB
-                    "disk_write": round(disk_write / 1024 / 1024, 2), # MB
-                    "timestamp": datetime.datetime.now().strftime('%H:%M:%S')
-                }
-                yield f"data: {json.dumps(data)}\n\n"
+            q = stats_hub.subscribe(container.id, container.name)
+            window = []  # samples since the last frame, when an interval is set
+            last_sent = 0
+            try:
+                while True:
+                    try:
+                        sample = q.get(timeout=15)
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+                        continue
+                    if sample is None:
+                        yield f"data: {json.dumps({'error': 'Container excluded'})}\n\n"
+                        return
+                    if interval:
+                        window.append(sample)
+                        if sample['time'] - last_sent < interval:
+                            continue
+                        sample = dict(sample)
+                        for field in RATE_FIELDS:
+                            sample[field] = int(sum(s[field] for s in window) / len(window))
+                        window = []
+                        last_sent = sample['time']
+                    yield f"data: {json.dumps(sample)}\n\n"
+            finally:
+                stats_hub.unsubscribe(container.id, q)
         except Exception as e:
             yield f"data: Error: {str(e)}\n\n"
 
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+    return Response(stream_with_context(sse_clients.counted('stats', generate())), mimetype='text/event-stream')
 
-@app.route('/api/volumes')
+@app.route('/api/stats/<container_id>/snapshot')
 @login_required
-def get_volumes():
-    target_container = request.args.get('container_id')
-    if not client: return jsonify([])
-    
+def stats_snapshot(container_id):
+    """Single stats sample as JSON.
+
+    Served from the shared collector when it has a fresh sample; otherwise a one-shot
+    stats call that skips the daemon's precpu wait (so CPU reads 0 and rates are 0).
+    """
+    if not client:
+        return jsonify({'error': 'Docker client not initialized'}), 500
     try:
-        allowed_volumes = None
-        if target_container:
+        container = client.containers.get(container_id)
+        if container.status != 'running':
+            return jsonify({'error': 'Container excluded'})
+        sample = stats_hub.latest(container.id, max_age=5)
+        if sample is None:
+            sample = calculate_stats(client.api.stats(container.id, stream=False, one_shot=True))
+            sample['one_shot'] = True
+        return jsonify(sample)
+    except docker.errors.NotFound:
+        return jsonify({'error': f'Container {container_id} not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# --- Metrics History ---
+class MetricsStore:
+    """Rolls collector samples up into 1m/5m/1h buckets in config/metrics.db.
+
+    Samples are accumulated in memory and merged into the on-disk buckets on every
+    flush, so a bucket that spans several flushes (or a restart) keeps a correct average.
+    CPU and memory are averaged with a max alongside; network and disk counters are
+    cumulative, so a bucket keeps the last value seen.
+    """
+
+    def __init__(self, path, tiers):
+        self.path = path
+        self.tiers = tiers
+        self._pending = {}
+        self._lock = threading.Lock()
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''CREATE TABLE IF NOT EXISTS metrics
+                        (tier INTEGER, container TEXT, bucket INTEGER,
+                         samples INTEGER,
+                         cpu REAL, cpu_max REAL,
+                         memory REAL, mem_max REAL, mem_percent REAL,
+                         net_rx REAL, net_tx REAL, disk_read REAL, disk_write REAL,
+                         PRIMARY KEY (tier, container, bucket)) WITHOUT ROWID''')
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, container, sample):
+        ts = int(sample['time'])
+        with self._lock:
+            for step, _ in self.tiers:
+                key = (step, container, ts - ts % step)
+                acc = self._pending.get(key)
+                if acc is None:
+                    self._pending[key] = [1, sample['cpu'], sample['cpu'], sample['memory'], sample['memory'],
+                                          sample['mem_percent'], sample['net_rx'], sample['net_tx'],
+                                          sample['disk_read'], sample['disk_write']]
+                else:
+                    acc[0] += 1
+                    acc[1] += sample['cpu']
+                    acc[2] = max(acc[2], sample['cpu'])
+                    acc[3] += sample['memory']
+                    acc[4] = max(acc[4], sample['memory'])
+                    acc[5] += sample['mem_percent']
+                    acc[6:] = [sample['net_rx'], sample['net_tx'], sample['disk_read'], sample['disk_write']]
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        rows = [(step, container, bucket, a[0], a[1] / a[0], a[2], a[3] / a[0], a[4], a[5] / a[0],
+                 a[6], a[7], a[8], a[9])
+                for (step, container, bucket), a in pending.items()]
+        conn = self.connect()
+        try:
+            if rows:
+                conn.executemany('''INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (tier, container, bucket) DO UPDATE SET
+                        cpu = (cpu * samples + excluded.cpu * excluded.samples) / (samples + excluded.samples),
+                        memory = (memory * samples + excluded.memory * excluded.samples) / (samples + excluded.samples),
+                        mem_percent = (mem_percent * samples + excluded.mem_percent * excluded.samples) / (samples + excluded.samples),
+                        cpu_max = MAX(cpu_max, excluded.cpu_max),
+                        mem_max = MAX(mem_max, excluded.mem_max),
+                        net_rx = excluded.net_rx, net_tx = excluded.net_tx,
+                        disk_read = excluded.disk_read, disk_write = excluded.disk_write,
+                        samples = samples + excluded.samples''', rows)
+            # Retention
+            now = int(time.time())
+            for step, days in self.tiers:
+                conn.execute("DELETE FROM metrics WHERE tier=? AND bucket < ?", (step, now - int(days * 86400)))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def pick_tier(self, start, step):
+        """Coarsest tier no coarser than ``step`` that still retains ``start``."""
+        now = time.time()
+        fitting = [t for t in self.tiers if t[0] <= step] or self.tiers[:1]
+        index = self.tiers.index(fitting[-1])
+        while index < len(self.tiers) - 1 and start < now - self.tiers[index][1] * 86400:
+            index += 1
+        return self.tiers[index][0]
+
+    def query(self, container, start, end, step):
+        tier = self.pick_tier(start, step)
+        step = max(tier, step - step % tier)
+        conn = self.connect()
+        try:
+            rows = conn.execute('''SELECT (bucket / ?) * ? AS t, SUM(samples),
+                                   SUM(cpu * samples) / SUM(samples), MAX(cpu_max),
+                                   SUM(memory * samples) / SUM(samples), MAX(mem_max),
+                                   SUM(mem_percent * samples) / SUM(samples),
+                                   MAX(net_rx), MAX(net_tx), MAX(disk_read), MAX(disk_write)
+                                FROM metrics WHERE tier=? AND container=? AND bucket >= ? AND bucket < ?
+                                GROUP BY t ORDER BY t''',
+                                (step, step, tier, container, start - start % tier, end)).fetchall()
+        finally:
+            conn.close()
+        points = [{'t': r[0], 'samples': r[1], 'cpu': round(r[2], 2), 'cpu_max': round(r[3], 2),
+                   'memory': round(r[4], 2), 'mem_max': round(r[5], 2), 'mem_percent': round(r[6], 2),
+                   'net_rx': r[7], 'net_tx': r[8], 'disk_read': r[9], 'disk_write': r[10]}
+                  for r in rows]
+        return {'container': container, 'tier': tier, 'step': step, 'from': start, 'to': end, 'points': points}
+
+metrics_store = MetricsStore(METRICS_DB_PATH, METRIC_TIERS)
+
+def metrics_flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            metrics_store.flush()
+        except Exception as e:
+            print(f"Metrics flush error: {e}")
+
+@app.route('/api/metrics/<path:container>')
+@login_required
+def metrics_range(container):
+    """Historical metrics: ?from=&to= are unix timestamps, ?step= is seconds per point."""
+    try:
+        end = int(request.args.get('to', time.time()))
+        start = int(request.args.get('from', end - 3600))
+        if start >= end:
+            return jsonify({'error': 'from must be before to'}), 400
+        # Default to ~300 points across the window
+        step = int(request.args.get('step', 0)) or max(60, (end - start) // 300)
+    except ValueError:
+        return jsonify({'error': 'from, to and step must be integers'}), 400
+
+    # History is keyed by name; resolve IDs of existing containers, otherwise use as-is
+    name = container.lstrip('/')
+    if client:
+        try:
+            name = client.containers.get(container).name
+        except Exception:
+            pass
+    return jsonify(metrics_store.query(name, start, end, step))
+
+# --- Disk Usage ---
+# client.df() walks every image, container, volume and build cache entry and can take
+# seconds, so one snapshot is shared by all callers and concurrent misses share one call.
+disk_usage_cache = KeyedTTLCache(DF_CACHE_TTL, max_entries=1)
+
+def get_disk_usage(refresh=False):
+    return disk_usage_cache.get('df', client.df, refresh=refresh)
+
+@app.route('/api/system/df/refresh', methods=['POST'])
+@login_required
+def refresh_disk_usage():
+    try:
+        return jsonify(get_disk_usage(refresh=True))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/volumes')
+@login_required
+def get_volumes():
+    target_container = request.args.get('container_id')
+    if not client: return jsonify([])
+    
+    try:
+        allowed_volumes = None
+        if target_container:
             try:
                 c = client.containers.get(target_container)
                 allowed_volumes = set()
@@ -530,26 +1808,18 @@ def get_volumes():
             except: 
                 return jsonify([])
         
-        volumes = client.volumes.list()
-        usage = {}
-        try:
-             df = client.df()
-             if 'Volumes' in df and df['Volumes']:
-                 for v in df['Volumes']:
-                     usage[v['Name']] = v.get('UsageData', {})
-        except: pass
-
+        # The df snapshot already lists every volume with its usage
         final_list = []
-        for v in volumes:
-            if allowed_volumes is not None and v.name not in allowed_volumes:
+        for v in get_disk_usage().get('Volumes') or []:
+            if allowed_volumes is not None and v['Name'] not in allowed_volumes:
                 continue
-            u = usage.get(v.name, {})
+            u = v.get('UsageData') or {}
             size = u.get('Size', 0)
             if size == -1: size = 0 
             
             final_list.append({
-                "Name": v.name,
-                "Driver": v.attrs.get('Driver', 'local'),
+                "Name": v['Name'],
+                "Driver": v.get('Driver', 'local'),
                 "Size": size, 
                 "RefCount": u.get('RefCount', 0)
             })
@@ -561,9 +1831,22 @@ def get_volumes():
 @app.route('/api/logs/<container_id>')
 @login_required
 def stream_logs(container_id):
+    """Follow a container's logs over SSE.
+
+    ?batch=1 coalesces lines into one frame every batch_ms milliseconds or
+    batch_lines lines (multi-line SSE data). If the client falls behind, the
+    oldest pending lines are dropped and a ``dropped`` event reports the total.
+    """
     if not client:
         return "Docker client not initialized", 500
 
+    batched = request.args.get('batch') == '1'
+    try:
+        batch_ms = int(request.args.get('batch_ms', LOG_BATCH_MS))
+        batch_lines = int(request.args.get('batch_lines', LOG_BATCH_LINES))
+    except ValueError:
+        return "batch_ms and batch_lines must be integers", 400
+
     def generate():
         last_id = request.headers.get('Last-Event-ID')
         try:
@@ -579,6 +1862,10 @@ def stream_logs(container_id):
                     kwargs['tail'] = 100
             else:
                 kwargs['tail'] = 100
+
+            if batched:
+                yield from generate_batched(container.logs(**kwargs))
+                return
                 
             for line in container.logs(**kwargs):
                 # We emit the current server time as the ID for the next reconnect point
@@ -588,85 +1875,660 @@ def stream_logs(container_id):
         except Exception as e:
             yield f"data: Error: {str(e)}\n\n"
 
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+    def generate_batched(log_stream):
+        buffer = LogBuffer(LOG_MAX_PENDING)
+        threading.Thread(target=pump_log_lines, args=(log_stream, buffer), daemon=True).start()
+        try:
+            yield from sse_log_batches(buffer, batch_lines, batch_ms / 1000.0)
+        finally:
+            # Unblocks the reader thread when the browser goes away
+            try:
+                log_stream.close()
+            except Exception:
+                pass
+
+    return Response(stream_with_context(sse_clients.counted('logs', generate())), mimetype='text/event-stream')
+
+@app.route('/api/logs/merged')
+@login_required
+def stream_merged_logs():
+    """Follow several containers' logs as one SSE stream, merged in timestamp order.
+
+    Select containers with ?containers=id-or-name,..., ?label=key[=value] or
+    ?project=<compose project>; ?tail= lines of history per container (default 50).
+    Each frame carries one JSON object per data: line: {"c": source, "t": timestamp, "l": text}.
+    Lines are held for a short reorder window so slower streams can be merged in order.
+    """
+    if not client:
+        return "Docker client not initialized", 500
+
+    wanted = [c for c in request.args.get('containers', '').split(',') if c]
+    label = request.args.get('label')
+    if request.args.get('project'):
+        label = f"com.docker.compose.project={request.args['project']}"
+    if not wanted and not label:
+        return jsonify({'error': 'Pass containers, label or project'}), 400
+    try:
+        tail = int(request.args.get('tail', 50))
+    except ValueError:
+        return jsonify({'error': 'tail must be an integer'}), 400
+
+    if not container_inventory.seeded:
+        container_inventory.seed()
+    label_key, _, label_value = (label or '').partition('=')
+    selected = []
+    for c in container_inventory.running():
+        if wanted and not any(c['name'] == w or c['id'].startswith(w) for w in wanted):
+            continue
+        if label and (label_key not in c['labels'] or (label_value and c['labels'][label_key] != label_value)):
+            continue
+        selected.append(c)
+    if not selected:
+        return jsonify({'error': 'No running containers match'}), 404
+    if len(selected) > LOG_MERGE_MAX_CONTAINERS:
+        return jsonify({'error': f'Too many containers ({len(selected)}), limit is {LOG_MERGE_MAX_CONTAINERS}'}), 400
+
+    interval = LOG_BATCH_MS / 1000.0
+    reorder_window = interval * 2
+
+    def generate():
+        buffer = LogBuffer(LOG_MAX_PENDING, readers=len(selected))
+        streams = []
+        try:
+            for c in selected:
+                log_stream = client.api.logs(c['id'], stream=True, follow=True, timestamps=True, tail=tail)
+                streams.append(log_stream)
+                threading.Thread(target=pump_tagged_log_lines, args=(log_stream, buffer, c['name']), daemon=True).start()
+
+            yield f"event: sources\ndata: {json.dumps([c['name'] for c in selected])}\n\n"
+            pending = []  # heap of (sort key, seq, arrival, timestamp, source, text)
+            seq = 0
+            reported = 0
+            idle_since = time.time()
+            while True:
+                items, dropped, closed = buffer.take(LOG_BATCH_LINES, interval)
+                now = time.time()
+                for timestamp, source, text in items:
+                    heapq.heappush(pending, (log_sort_key(timestamp), seq, now, timestamp, source, text))
+                    seq += 1
+                ready = []
+                while pending and len(ready) < LOG_BATCH_LINES and (closed or pending[0][2] <= now - reorder_window):
+                    _, _, _, timestamp, source, text = heapq.heappop(pending)
+                    ready.append(json.dumps({'c': source, 't': timestamp, 'l': text}))
+                if dropped > reported:
+                    yield f"event: dropped\ndata: {json.dumps({'dropped': dropped, 'new': dropped - reported})}\n\n"
+                    reported = dropped
+                if ready:
+                    yield "".join(f"data: {line}\n" for line in ready) + "\n"
+                    idle_since = now
+                elif closed and not pending:
+                    return
+                elif now - idle_since > 15:
+                    yield ": keepalive\n\n"
+                    idle_since = now
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            for log_stream in streams:
+                try:
+                    log_stream.close()
+                except Exception:
+                    pass
+
+    return Response(stream_with_context(sse_clients.counted('logs_merged', generate())), mimetype='text/event-stream')
+
+@app.route('/api/logs/<container_id>/search')
+@login_required
+def search_logs(container_id):
+    """Scan a container's logs on the server and return only matching lines.
+
+    Parameters: q (required), regex=1, case=1 (case sensitive), since/until/tail,
+    stdout=0 / stderr=0 to skip a stream, context (lines around each match, max 20)
+    and limit (max matches, default 100). Scanning stops once the limit is reached,
+    after LOG_SEARCH_MAX_LINES lines or after LOG_SEARCH_TIMEOUT seconds, and reports
+    truncated. Without since/tail only the newest LOG_SEARCH_MAX_LINES lines are read.
+    """
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+        context = max(0, min(int(request.args.get('context', 0)), 20))
+        window = log_window_args()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    if 'tail' not in window and 'since' not in window:
+        window['tail'] = LOG_SEARCH_MAX_LINES
+
+    flags = 0 if request.args.get('case') == '1' else re.IGNORECASE
+    try:
+        pattern = re.compile(query if request.args.get('regex') == '1' else re.escape(query), flags)
+    except re.error as e:
+        return jsonify({'error': f'Invalid regex: {e}'}), 400
+
+    try:
+        container = client.containers.get(container_id)
+        log_stream = container.logs(stream=True, follow=False,
+                                    stdout=request.args.get('stdout', '1') != '0',
+                                    stderr=request.args.get('stderr', '1') != '0',
+                                    timestamps=request.args.get('timestamps') == '1',
+                                    **window)
+        matches = []
+        before = deque(maxlen=context)
+        waiting = []  # matches still collecting their trailing context
+        scanned = 0
+        truncated = False
+        deadline = time.time() + LOG_SEARCH_TIMEOUT
+        for line_no, line in enumerate(iter_log_lines(log_stream), 1):
+            if line_no > LOG_SEARCH_MAX_LINES or time.time() > deadline:
+                truncated = True
+                break
+            scanned = line_no
+            for m in waiting:
+                m['after'].append(line)
+            waiting = [m for m in waiting if len(m['after']) < context]
+            if len(matches) >= limit:
+                if not waiting:
+                    truncated = True
+                    break
+            elif pattern.search(line):
+                match = {'line': line_no, 'text': line, 'before': list(before), 'after': []}
+                matches.append(match)
+                if context:
+                    waiting.append(match)
+            before.append(line)
+        if hasattr(log_stream, 'close'):
+            log_stream.close()
+
+        return jsonify({
+            'container': container.name.replace('/', ''),
+            'matches': matches,
+            'scanned': scanned,
+            'truncated': truncated
+        })
+    except docker.errors.NotFound:
+        return jsonify({'error': f'Container {container_id} not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # --- Image Management Routes ---
+IMAGE_FIELDS = ('id', 'long_id', 'tags', 'size_mb', 'created', 'labels')
+
+def image_tags(img):
+    return [t for t in (img.get('RepoTags') or []) if t != '<none>:<none>']
+
+IMAGE_SORTS = {
+    'created': lambda img: img.get('Created') or 0,
+    'size': lambda img: img.get('Size') or 0,
+    'tag': lambda img: (image_tags(img) or ['~'])[0],  # untagged images sort together, last
+}
+
+def image_row(img, fields):
+    tags = image_tags(img) or ['<none>:<none>']
+    row = {
+        'id': img['Id'][:19],  # same as docker-py short_id: 'sha256:' + 12 hex digits
+        'long_id': img['Id'],
+        'tags': tags,
+        'size_mb': round((img.get('Size') or 0) / (1024*1024), 2),
+        'created': datetime.datetime.utcfromtimestamp(img.get('Created') or 0).strftime('%Y-%m-%dT%H:%M:%S'),
+        'labels': img.get('Labels') or {}
+    }
+    return {f: row[f] for f in fields if f in row}
+
 @app.route('/api/images')
 @login_required
 def list_images():
+    """Image list from one summary call (no per-image inspect).
+
+    Filters: dangling=1 (only untagged) / dangling=0 (only tagged), repo=<tag prefix>.
+    sort=created|size|tag with order=asc|desc (default newest first). fields=id,tags,...
+    limits the keys returned; adding ``history`` includes the cached history summary.
+    With page/per_page the response is {images, total, page, per_page} instead of
+    a plain list.
+    """
     try:
-        images = client.images.list()
-        img_list = []
-        for img in images:
-            # parsing size, tags, created
-            tags = img.tags if img.tags else ['<none>:<none>']
-            size_mb = round(img.attrs.get('Size', 0) / (1024*1024), 2)
-            created = img.attrs.get('Created', '').split('.')[0]
-            img_list.append({
-                'id': img.short_id,
-                'long_id': img.id,
-                'tags': tags,
-                'size_mb': size_mb,
-                'created': created,
-                'labels': img.labels
-            })
+        fields = [f for f in request.args.get('fields', '').split(',') if f] or list(IMAGE_FIELDS)
+        sort = request.args.get('sort', 'created')
+        if sort not in IMAGE_SORTS:
+            return jsonify({'error': f"sort must be one of {', '.join(IMAGE_SORTS)}"}), 400
+        descending = request.args.get('order', 'asc' if sort == 'tag' else 'desc') == 'desc'
+        paged = 'page' in request.args or 'per_page' in request.args
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            per_page = min(max(1, int(request.args.get('per_page', 100))), 1000)
+        except ValueError:
+            return jsonify({'error': 'page and per_page must be integers'}), 400
+
+        images = client.api.images()
+        dangling = request.args.get('dangling')
+        if dangling in ('0', '1'):
+            images = [img for img in images if bool(image_tags(img)) != (dangling == '1')]
+        repo = request.args.get('repo')
+        if repo:
+            images = [img for img in images if any(t.startswith(repo) for t in image_tags(img))]
+        images.sort(key=IMAGE_SORTS[sort], reverse=descending)
+
+        total = len(images)
+        if paged:
+            images = images[(page - 1) * per_page:page * per_page]
+        img_list = [image_row(img, fields) for img in images]
+        if 'history' in fields:
+            shared = image_shared_sizes()
+            for img, row in zip(images, img_list):
+                row['history'] = image_history_summary(img['Id'], shared)
+
+        if paged:
+            return jsonify({'images': img_list, 'total': total, 'page': page, 'per_page': per_page})
         return jsonify(img_list)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# History is immutable for a given image ID, so summaries are kept for a day
+image_history_cache = KeyedTTLCache(86400, max_entries=5000)
+
+def load_history_summary(image_id):
+    history = client.api.history(image_id)
+    return {
+        'layers': sum(1 for h in history if h.get('Size')),
+        'steps': len(history),
+        'size': sum(h.get('Size') or 0 for h in history)
+    }
+
+def image_shared_sizes():
+    """Image ID -> bytes shared with other images, from the cached df snapshot."""
+    try:
+        return {img['Id']: img.get('SharedSize', -1) for img in get_disk_usage().get('Images') or []}
+    except Exception:
+        return {}
+
+def image_history_summary(image_id, shared_sizes=None):
+    summary = dict(image_history_cache.get(image_id, lambda: load_history_summary(image_id)))
+    shared = (shared_sizes if shared_sizes is not None else image_shared_sizes()).get(image_id, -1)
+    summary['shared_size'] = shared if shared is not None and shared >= 0 else None
+    return summary
+
 @app.route('/api/images/history/<path:image_id>')
 @login_required
 def image_history(image_id):
+    """Full image history, or with ?summary=1 just layer count, size and shared size."""
     try:
         # allow image_id to be ID or tag
         image = client.images.get(image_id)
+        if request.args.get('summary') == '1':
+            return jsonify(dict(image_history_summary(image.id), id=image.id))
         history = image.history()
         return jsonify(history)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/images/scan/<path:image_id>')
+# --- Image Layer Analysis ---
+# Dockerfile instructions that only change metadata and never produce a filesystem layer
+METADATA_INSTRUCTION = re.compile(r'(/bin/sh -c )?(#\(nop\)\s*)?(ENV|CMD|LABEL|EXPOSE|ENTRYPOINT|USER|ARG|ONBUILD|STOPSIGNAL|'
+                                  r'HEALTHCHECK|SHELL|VOLUME|MAINTAINER)\b', re.IGNORECASE)
+
+def image_layer_chain(inspect, history):
+    """[(chain ID, size in bytes)] for an image, base layer first.
+
+    Chain IDs identify a layer together with everything below it (as in the image
+    spec), so equal chain IDs are the same stored layer. Sizes come from the history
+    entries that created a filesystem layer; the second value is False when those
+    could not be matched to RootFS.Layers one to one and sizes are approximate.
+    """
+    diff_ids = (inspect.get('RootFS') or {}).get('Layers') or []
+    steps = list(reversed(history))  # the API lists newest first
+    sized = [h for h in steps
+             if (h.get('Size') or 0) > 0 or not METADATA_INSTRUCTION.match(h.get('CreatedBy') or '')]
+    exact = len(sized) == len(diff_ids)
+    if not exact:
+        nonzero = [h for h in steps if (h.get('Size') or 0) > 0]
+        if len(nonzero) == len(diff_ids):
+            sized, exact = nonzero, True
+    sizes = [h.get('Size') or 0 for h in sized]
+    if not exact:
+        # Align from the top layer down; unmatched base layers count as 0 bytes
+        sizes = ([0] * len(diff_ids) + sizes)[-len(diff_ids):] if diff_ids else []
+
+    chain = []
+    chain_id = None
+    for diff_id, size in zip(diff_ids, sizes):
+        chain_id = diff_id if chain_id is None else \
+            'sha256:' + hashlib.sha256(f"{chain_id} {diff_id}".encode()).hexdigest()
+        chain.append((chain_id, size))
+    return chain, exact
+
+class LayerIndex:
+    """Layer -> images index for shared/unique size analysis.
+
+    Per-image layer chains are kept between refreshes; a refresh lists image
+    summaries once and only inspects images it has not seen before, in parallel.
+    Image events mark the index dirty so the next request refreshes it.
+    """
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        self._images = {}  # image id -> {'tags', 'chain', 'exact'}
+        self._dirty = True
+        self._lock = threading.Lock()  # one refresh at a time
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _load(self, image_id):
+        return image_layer_chain(client.api.inspect_image(image_id), client.api.history(image_id))
+
+    def analyse(self):
+        """Refresh if image events arrived, then compute the analysis (cheap: one pass over layers)."""
+        started = time.time()
+        inspected = self.refresh()
+        result = self._analyse(self._images)
+        result.update({'build_ms': round((time.time() - started) * 1000, 1), 'inspected': inspected})
+        return result
+
+    def refresh(self):
+        """Bring the index up to date; returns how many images had to be inspected."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            self._dirty = False  # events arriving during the refresh mark it dirty again
+            try:
+                summaries = {img['Id']: image_tags(img) for img in client.api.images()}
+            except Exception:
+                self._dirty = True  # keep the old index, but retry on the next call
+                raise
+            images = {i: self._images[i] for i in summaries if i in self._images}
+            new = [i for i in summaries if i not in images]
+            if new:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='layers') as pool:
+                    for image_id, result in zip(new, pool.map(self._safe_load, new)):
+                        if result is not None:
+                            images[image_id] = {'chain': result[0], 'exact': result[1]}
+                        else:
+                            self._dirty = True  # retry images that failed to inspect
+            for image_id, entry in images.items():
+                entry['tags'] = summaries[image_id]
+            self._images = images
+            return len(new)
+
+    def _safe_load(self, image_id):
+        try:
+            return self._load(image_id)
+        except Exception as e:
+            # Removed while we were listing, usually
+            print(f"Layer index: skipping {image_id[:19]}: {e}")
+            return None
+
+    def _analyse(self, images):
+        owners = {}  # chain id -> number of images using it
+        sizes = {}
+        for entry in images.values():
+            for chain_id, size in entry['chain']:
+                owners[chain_id] = owners.get(chain_id, 0) + 1
+                sizes[chain_id] = size
+
+        in_use = container_inventory.image_usage() if container_inventory.seeded else {}
+        rows = []
+        for image_id, entry in images.items():
+            unique = shared = shared_layers = 0
+            for chain_id, size in entry['chain']:
+                if owners[chain_id] > 1:
+                    shared += size
+                    shared_layers += 1
+                else:
+                    unique += size
+            rows.append({
+                'id': image_id[:19],
+                'long_id': image_id,
+                'tags': entry['tags'] or ['<none>:<none>'],
+                'layers': len(entry['chain']),
+                'shared_layers': shared_layers,
+                'size': unique + shared,
+                'unique_size': unique,
+                'shared_size': shared,
+                'containers': in_use.get(image_id, []),
+                'approximate': not entry['exact']
+            })
+        rows.sort(key=lambda r: r['unique_size'], reverse=True)
+        # Removing an unused image frees exactly its unique layers
+        reclaimable = [r for r in rows if not r['containers'] and r['unique_size'] > 0]
+        return {
+            'images': rows,
+            'reclaimable': [{'long_id': r['long_id'], 'tags': r['tags'], 'reclaimable_size': r['unique_size']}
+                            for r in reclaimable],
+            'total_reclaimable': sum(r['unique_size'] for r in reclaimable),
+            'layer_count': len(sizes),
+            'layer_size': sum(sizes.values()),
+            'shared_layer_count': sum(1 for n in owners.values() if n > 1)
+        }
+
+layer_index = LayerIndex()
+
+@app.route('/api/images/layers')
 @login_required
-def scan_image(image_id):
+def image_layer_analysis():
+    """Unique vs shared bytes per image and a ranked list of space reclaimable by removing unused images.
+
+    ?limit= caps the images and reclaimable lists (default 100); ?in_use=0 hides
+    images that containers were created from.
+    """
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
     try:
-        # First check if Trivy is installed
+        analysis = layer_index.analyse()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    images = analysis['images']
+    if request.args.get('in_use') == '0':
+        images = [r for r in images if not r['containers']]
+    analysis['image_count'] = len(analysis['images'])
+    analysis['images'] = images[:limit]
+    analysis['reclaimable'] = analysis['reclaimable'][:limit]
+    return jsonify(analysis)
+
+# --- Vulnerability Scans ---
+TRIVY_INSTALL_HELP = {
+    'message': 'Please install Trivy to use vulnerability scanning: https://aquasecurity.github.io/trivy/',
+    'install_command': 'See https://aquasecurity.github.io/trivy/latest/getting-started/installation/'
+}
+
+class TrivyUnavailable(Exception):
+    pass
+
+def read_trivy_db_version():
+    """Trivy's vulnerability DB timestamp; results are only reused while it is unchanged."""
+    def run(cmd):
         try:
-            trivy_check = subprocess.run(["trivy", "--version"], capture_output=True, text=True, timeout=5)
-            if trivy_check.returncode != 0:
-                return jsonify({
-                    'error': 'Trivy is not installed or not accessible',
-                    'message': 'Please install Trivy to use vulnerability scanning: https://aquasecurity.github.io/trivy/'
-                }), 400
+            return subprocess.run(cmd, capture_output=True, text=True, timeout=10)
         except FileNotFoundError:
-            return jsonify({
-                'error': 'Trivy is not installed',
-                'message': 'Please install Trivy to use vulnerability scanning: https://aquasecurity.github.io/trivy/',
-                'install_command': 'See https://aquasecurity.github.io/trivy/latest/getting-started/installation/'
-            }), 400
+            raise TrivyUnavailable('Trivy is not installed')
         except subprocess.TimeoutExpired:
-            return jsonify({'error': 'Trivy check timed out'}), 500
-        
-        image = client.images.get(image_id)
-        # Use repo tag if available, else ID
-        target = image.tags[0] if image.tags else image.id
-        
-        # Trivy command with timeout
-        cmd = ["trivy", "image", "--format", "json", "--scanners", "vuln", target]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)  # 5 min timeout
-        
+            raise TrivyUnavailable('Trivy check timed out')
+
+    check = run(["trivy", "--version", "--format", "json"])
+    if check.returncode != 0:
+        # Older Trivy rejects --format on --version
+        check = run(["trivy", "--version"])
+        if check.returncode != 0:
+            raise TrivyUnavailable('Trivy is not installed or not accessible')
+    try:
+        db = json.loads(check.stdout).get('VulnerabilityDB') or {}
+        return db.get('UpdatedAt') or 'none'
+    except ValueError:
+        # Plain-text version output: key on the whole text
+        return check.stdout.strip()
+
+trivy_db_version_cache = KeyedTTLCache(600, max_entries=1)
+
+def trivy_db_version():
+    return trivy_db_version_cache.get('db', read_trivy_db_version)
+
+class TrivyScanner:
+    """Runs Trivy scans from a bounded queue and stores results per image ID and DB version.
+
+    The image ID is the digest of the image config, so a result is reused until the
+    image changes or Trivy updates its vulnerability DB. Each image is queued at
+    most once at a time; jobs are kept in memory for polling.
+    """
+
+    def __init__(self, workers=1, queue_size=200, timeout=300, job_ttl=3600):
+        self.workers = workers
+        self.timeout = timeout
+        self.job_ttl = job_ttl
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._jobs = {}  # image id -> job
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True, name=f'trivy-{i}').start()
+
+    def cached(self, image_id, db_version):
+        """(scanned at, Trivy JSON text) or None."""
+        c = get_db().cursor()
+        c.execute("SELECT scanned_at, result FROM image_scans WHERE image_id=? AND db_version=?", (image_id, db_version))
+        row = c.fetchone()
+        if row is None:
+            return None
+        return row[0], zlib.decompress(row[1]).decode('utf-8')
+
+    def job(self, image_id):
+        with self._lock:
+            job = self._jobs.get(image_id)
+            return dict(job) if job else None
+
+    def submit(self, image_id, target):
+        """Queue a scan; returns the job (an existing one if already queued) or None when full."""
+        self._expire()
+        with self._lock:
+            job = self._jobs.get(image_id)
+            if job and job['status'] in ('queued', 'running'):
+                return dict(job)
+            job = {'image_id': image_id, 'target': target, 'status': 'queued', 'error': None,
+                   'queued': time.time(), 'started': None, 'finished': None}
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                return None
+            self._jobs[image_id] = job
+            return dict(job)
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._scan(job)
+            except Exception as e:
+                job['error'] = str(e)
+            finally:
+                job['status'] = 'error' if job['error'] else 'done'
+                job['finished'] = time.time()
+
+    def _scan(self, job):
+        job.update({'status': 'running', 'started': time.time()})
+        cmd = ["trivy", "image", "--format", "json", "--scanners", "vuln", job['target']]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.timeout)
+        except FileNotFoundError:
+            raise RuntimeError('Trivy is not installed')
+        except subprocess.TimeoutExpired:
+            raise RuntimeError('Scan timed out. Image might be too large or Trivy is taking too long.')
         if result.returncode != 0:
-             # Trivy might fail if DB not found or other issues
-             err = result.stderr or "Unknown error"
-             return jsonify({
-                 'error': 'Trivy scan failed',
-                 'details': err,
-                 'stdout': result.stdout
-             }), 500
-             
-        # Return raw JSON from trivy
-        return Response(result.stdout, mimetype='application/json')
-    except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Scan timed out. Image might be too large or Trivy is taking too long.'}), 500
+            # Trivy might fail if DB not found or other issues
+            raise RuntimeError(f"Trivy scan failed: {result.stderr or 'Unknown error'}")
+        # The scan may have downloaded a newer DB; key the result on the one it used
+        trivy_db_version_cache.invalidate('db')
+        db_version = trivy_db_version()
+        conn = get_db()
+        # Results for older DB versions are superseded
+        conn.execute("DELETE FROM image_scans WHERE image_id=?", (job['image_id'],))
+        conn.execute("INSERT INTO image_scans (image_id, db_version, target, result) VALUES (?, ?, ?, ?)",
+                     (job['image_id'], db_version, job['target'], zlib.compress(result.stdout.encode('utf-8'))))
+        conn.commit()
+
+    def scan_all(self):
+        """Queue every image without a result for the current DB; returns how many were queued."""
+        db_version = trivy_db_version()
+        c = get_db().cursor()
+        c.execute("SELECT image_id FROM image_scans WHERE db_version=?", (db_version,))
+        done = {row[0] for row in c.fetchall()}
+        images = client.api.images()
+        live = {img['Id'] for img in images}
+        conn = get_db()
+        # Forget results of images that no longer exist
+        conn.executemany("DELETE FROM image_scans WHERE image_id=?",
+                         [(row[0],) for row in conn.execute("SELECT image_id FROM image_scans").fetchall()
+                          if row[0] not in live])
+        conn.commit()
+        queued = 0
+        for img in images:
+            if img['Id'] in done:
+                continue
+            tags = [t for t in (img.get('RepoTags') or []) if t != '<none>:<none>']
+            if self.submit(img['Id'], tags[0] if tags else img['Id']) is None:
+                break  # queue full; the rest wait for the next run
+            queued += 1
+        return queued
+
+    def status(self):
+        with self._lock:
+            jobs = [dict(j) for j in self._jobs.values()]
+        return {'queue_depth': self.queue.qsize(), 'queue_size': self.queue.maxsize,
+                'workers': self.workers, 'jobs': jobs}
+
+    def _expire(self):
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            for image_id in [i for i, j in self._jobs.items() if j['finished'] and j['finished'] < cutoff]:
+                del self._jobs[image_id]
+
+trivy_scanner = TrivyScanner(workers=TRIVY_WORKERS, queue_size=TRIVY_QUEUE_SIZE, timeout=TRIVY_TIMEOUT)
+
+def nightly_scan_loop():
+    while True:
+        now = datetime.datetime.now()
+        next_run = now.replace(hour=TRIVY_NIGHTLY_HOUR, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += datetime.timedelta(days=1)
+        time.sleep((next_run - now).total_seconds())
+        try:
+            queued = trivy_scanner.scan_all()
+            print(f"Nightly scan queued {queued} images")
+        except TrivyUnavailable:
+            pass
+        except Exception as e:
+            print(f"Nightly scan error: {e}")
+
+def resolve_scan_target(image_id):
+    image = client.images.get(image_id)
+    # Use repo tag if available, else ID
+    return image.id, image.tags[0] if image.tags else image.id
+
+@app.route('/api/images/scan/<path:image_id>', methods=['GET', 'POST'])
+@login_required
+def scan_image(image_id):
+    """Trivy vulnerability report for an image.
+
+    GET returns the stored Trivy JSON when the image was scanned with the current
+    vulnerability DB; otherwise (and on POST, which rescans with ?force=1) the scan is
+    queued and 202 is returned with the job. Poll /api/images/scan/<id>/status.
+    """
+    try:
+        db_version = trivy_db_version()
+        resolved_id, target = resolve_scan_target(image_id)
+        force = request.method == 'POST' and request.args.get('force') == '1'
+        cached = None if force else trivy_scanner.cached(resolved_id, db_version)
+        if cached:
+            scanned_at, result = cached
+            response = Response(result, mimetype='application/json')
+            response.headers['X-Scanned-At'] = scanned_at
+            return response
+        job = trivy_scanner.submit(resolved_id, target)
+        if job is None:
+            return jsonify({'error': 'Scan queue is full, try again later'}), 503
+        return jsonify(job), 202
+    except TrivyUnavailable as e:
+        return jsonify(dict(TRIVY_INSTALL_HELP, error=str(e))), 400
     except docker.errors.ImageNotFound:
         return jsonify({'error': f'Image {image_id} not found'}), 404
     except docker.errors.APIError as e:
@@ -674,6 +2536,38 @@ def scan_image(image_id):
     except Exception as e:
         return jsonify({'error': f'Unexpected error: {str(e)}'}), 500
 
+@app.route('/api/images/scan/<path:image_id>/status')
+@login_required
+def scan_status(image_id):
+    try:
+        resolved_id, _ = resolve_scan_target(image_id)
+        job = trivy_scanner.job(resolved_id)
+        if job and job['status'] in ('queued', 'running', 'error'):
+            return jsonify(job)
+        cached = trivy_scanner.cached(resolved_id, trivy_db_version())
+        if cached:
+            return jsonify({'image_id': resolved_id, 'status': 'done', 'scanned_at': cached[0]})
+        return jsonify({'image_id': resolved_id, 'status': 'not_scanned'})
+    except TrivyUnavailable as e:
+        return jsonify(dict(TRIVY_INSTALL_HELP, error=str(e))), 400
+    except docker.errors.ImageNotFound:
+        return jsonify({'error': f'Image {image_id} not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/images/scans', methods=['GET', 'POST'])
+@login_required
+def scan_queue():
+    """GET: scan queue and recent jobs. POST: queue every image not yet scanned with the current DB."""
+    if request.method == 'GET':
+        return jsonify(trivy_scanner.status())
+    try:
+        return jsonify({'queued': trivy_scanner.scan_all()}), 202
+    except TrivyUnavailable as e:
+        return jsonify(dict(TRIVY_INSTALL_HELP, error=str(e))), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/images/pull', methods=['POST'])
 @login_required
 def pull_image():
@@ -738,6 +2632,7 @@ def delete_image(image_id):
 def prune_images():
     try:
         pruned = client.images.prune()
+        disk_usage_cache.invalidate()
         return jsonify(pruned)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -782,11 +2677,12 @@ def system_info():
     try:
         info = client.info()
         version = client.version()
-        df = client.df()
+        df = get_disk_usage()
         return jsonify({
             'info': info,
             'version': version,
-            'df': df
+            'df': df,
+            'df_age': round(disk_usage_cache.peek('df')[1] or 0, 1)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -800,6 +2696,7 @@ def system_prune():
         i_prune = client.images.prune()
         v_prune = client.volumes.prune()
         n_prune = client.networks.prune()
+        disk_usage_cache.invalidate()
         return jsonify({
             'containers': c_prune,
             'images': i_prune,
@@ -834,82 +2731,486 @@ def container_top(container_id):
 @app.route('/api/alerts/config', methods=['GET', 'POST'])
 @login_required
 def alerts_config_api():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     if request.method == 'POST':
         data = request.json
+        conn = get_db()
+        c = conn.cursor()
         c.execute("""UPDATE alerts_config SET cpu_limit=?, mem_limit=?, 
                      slack_webhook=?, slack_enabled=?, discord_webhook=?, discord_enabled=?,
                      telegram_bot_token=?, telegram_chat_id=?, telegram_enabled=?,
-                     generic_webhook=?, generic_enabled=?, email_recipient=?, email_enabled=? WHERE id=1""",
+                     generic_webhook=?, generic_enabled=?, email_recipient=?, email_enabled=?,
+                     net_limit=?, io_limit=? WHERE id=1""",
                   (data.get('cpu_limit'), data.get('mem_limit'), 
                    data.get('slack_webhook'), data.get('slack_enabled', 0),
                    data.get('discord_webhook'), data.get('discord_enabled', 0),
                    data.get('telegram_bot_token'), data.get('telegram_chat_id'), data.get('telegram_enabled', 0),
                    data.get('generic_webhook'), data.get('generic_enabled', 0),
-                   data.get('email_recipient'), data.get('email_enabled', 0)))
+                   data.get('email_recipient'), data.get('email_enabled', 0),
+                   data.get('net_limit', 0), data.get('io_limit', 0)))
         conn.commit()
-        conn.close()
+        alerts_config_cache.invalidate()
         return jsonify({'status': 'updated'})
     else:
-        c.execute("SELECT * FROM alerts_config WHERE id=1")
-        row = c.fetchone()
-        conn.close()
-        if not row:
+        config = alerts_config_cache.get()
+        if not config:
             return jsonify({})
         return jsonify({
-            'cpu_limit': row[1], 'mem_limit': row[2], 
-            'slack_webhook': row[3] or '', 'slack_enabled': row[4] or 0,
-            'discord_webhook': row[5] or '', 'discord_enabled': row[6] or 0,
-            'telegram_bot_token': row[7] or '', 'telegram_chat_id': row[8] or '', 'telegram_enabled': row[9] or 0,
-            'generic_webhook': row[10] or '', 'generic_enabled': row[11] or 0,
-            'email_recipient': row[12] or '', 'email_enabled': row[13] or 0
+            'cpu_limit': config['cpu_limit'], 'mem_limit': config['mem_limit'], 
+            'slack_webhook': config['slack_webhook'] or '', 'slack_enabled': config['slack_enabled'] or 0,
+            'discord_webhook': config['discord_webhook'] or '', 'discord_enabled': config['discord_enabled'] or 0,
+            'telegram_bot_token': config['telegram_bot_token'] or '', 'telegram_chat_id': config['telegram_chat_id'] or '',
+            'telegram_enabled': config['telegram_enabled'] or 0,
+            'generic_webhook': config['generic_webhook'] or '', 'generic_enabled': config['generic_enabled'] or 0,
+            'email_recipient': config['email_recipient'] or '', 'email_enabled': config['email_enabled'] or 0,
+            'net_limit': config['net_limit'] or 0, 'io_limit': config['io_limit'] or 0
         })
 
 @app.route('/api/alerts/history')
 @login_required
 def alerts_history_api():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM alert_history ORDER BY timestamp DESC LIMIT 100")
+    """Newest-first alert history with keyset pagination.
+
+    Filters: level, container, from/to (UTC, 'YYYY-MM-DD[ HH:MM:SS]'). Pass the
+    X-Next-Cursor response header back as ?cursor= to fetch the next page.
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    where = []
+    params = []
+    if request.args.get('level'):
+        where.append("level = ?")
+        params.append(request.args['level'])
+    if request.args.get('container'):
+        where.append("container = ?")
+        params.append(request.args['container'])
+    if request.args.get('from'):
+        where.append("timestamp >= ?")
+        params.append(request.args['from'])
+    if request.args.get('to'):
+        end = request.args['to']
+        if len(end) == 10:  # whole day
+            end += ' 23:59:59'
+        where.append("timestamp <= ?")
+        params.append(end)
+    if request.args.get('cursor'):
+        try:
+            cursor_ts, cursor_id = request.args['cursor'].rsplit(',', 1)
+            cursor_id = int(cursor_id)
+            datetime.datetime.strptime(cursor_ts, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+        params.extend([cursor_ts, cursor_ts, cursor_id])
+
+    query = "SELECT id, timestamp, level, message, container FROM alert_history"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    c = get_db().cursor()
+    c.execute(query, params)
     rows = c.fetchall()
-    conn.close()
     history = []
-    for r in rows:
+    for r in rows[:limit]:
         history.append({'id': r[0], 'timestamp': r[1], 'level': r[2], 'message': r[3], 'container': r[4]})
-    return jsonify(history)
+    response = jsonify(history)
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers['X-Next-Cursor'] = f"{last[1]},{last[0]}"
+    return response
+
+def rule_from_request(data):
+    """Validated alert_rules column values from a JSON body; raises ValueError."""
+    if not data or not data.get('name') or not data.get('expression'):
+        raise ValueError("name and expression are required")
+    try:
+        threshold = float(data['threshold'])
+        clear = data.get('clear_threshold')
+        clear = None if clear in (None, '') else float(clear)
+        for_seconds = int(data.get('for_seconds') or 0)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("threshold, clear_threshold and for_seconds must be numbers")
+    values = (data['name'], 1 if data.get('enabled', 1) else 0, data.get('container_pattern') or '*',
+              data.get('label_selector') or '', data['expression'], data.get('operator') or '>',
+              threshold, clear, for_seconds, data.get('level') or 'Rule',
+              1 if data.get('notify_recovery', 1) else 0)
+    AlertRule((None,) + values)  # compiles the expression and checks the operator
+    return values
+
+@app.route('/api/alerts/rules', methods=['GET', 'POST'])
+@login_required
+def alert_rules_api():
+    conn = get_db()
+    c = conn.cursor()
+    if request.method == 'POST':
+        try:
+            values = rule_from_request(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        c.execute(f"INSERT INTO alert_rules ({', '.join(AlertRule.FIELDS[1:])}) VALUES ({', '.join('?' * len(values))})",
+                  values)
+        conn.commit()
+        alert_rules.invalidate()
+        return jsonify({'status': 'created', 'id': c.lastrowid}), 201
+    c.execute(f"SELECT {', '.join(AlertRule.FIELDS)} FROM alert_rules ORDER BY id")
+    return jsonify([dict(zip(AlertRule.FIELDS, row)) for row in c.fetchall()])
+
+@app.route('/api/alerts/rules/<int:rule_id>', methods=['PUT', 'DELETE'])
+@login_required
+def alert_rule_api(rule_id):
+    conn = get_db()
+    c = conn.cursor()
+    if request.method == 'DELETE':
+        c.execute("DELETE FROM alert_rules WHERE id=?", (rule_id,))
+    else:
+        try:
+            values = rule_from_request(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        c.execute(f"UPDATE alert_rules SET {', '.join(f + '=?' for f in AlertRule.FIELDS[1:])} WHERE id=?",
+                  values + (rule_id,))
+    if c.rowcount == 0:
+        return jsonify({'error': f'Rule {rule_id} not found'}), 404
+    conn.commit()
+    alert_rules.invalidate()
+    return jsonify({'status': 'deleted' if request.method == 'DELETE' else 'updated'})
+
+@app.route('/api/alerts/rules/state')
+@login_required
+def alert_rules_state_api():
+    """Rule conditions currently pending (inside their sustain window) or firing."""
+    return jsonify(alert_rules.states())
+
+def compact_alert_history():
+    """Apply the alert_history retention limits (age, then row count)."""
+    conn = get_db()
+    c = conn.cursor()
+    cutoff = (datetime.datetime.utcnow() - datetime.timedelta(days=ALERT_HISTORY_RETENTION_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    c.execute("DELETE FROM alert_history WHERE timestamp < ?", (cutoff,))
+    deleted = c.rowcount
+    c.execute("""DELETE FROM alert_history WHERE id IN
+                 (SELECT id FROM alert_history ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?)""",
+              (ALERT_HISTORY_MAX_ROWS,))
+    deleted += c.rowcount
+    conn.commit()
+    if deleted:
+        # Hand the freed WAL space back and refresh planner statistics
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        c.execute("PRAGMA optimize")
+        print(f"Alert history compaction removed {deleted} rows")
+    return deleted
+
+def history_maintenance_loop():
+    while True:
+        try:
+            compact_alert_history()
+            alert_cooldowns.prune()
+        except Exception as e:
+            print(f"Alert history compaction error: {e}")
+        try:
+            pdf_exports.sweep()
+        except Exception as e:
+            print(f"PDF export cleanup error: {e}")
+        time.sleep(3600)
 
 @app.route('/api/alerts/test', methods=['POST'])
 @login_required
 def test_notification():
     """Send a test notification to verify webhook configuration"""
     try:
-        send_notification(
+        queued = send_notification(
             "🧪 DockWatch Test Notification",
             "This is a test message from DockWatch. If you're seeing this, your notification configuration is working correctly!"
         )
+        if not queued:
+            return jsonify({'status': 'error', 'message': 'Notification queue is full'}), 503
         log_alert("Info", "Test notification sent", "System")
-        return jsonify({'status': 'success', 'message': 'Test notification sent successfully'})
+        return jsonify({'status': 'success', 'message': 'Test notification queued for delivery'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/alerts/dispatcher')
+@login_required
+def notification_status_api():
+    """Notification queue depth plus per-channel delivery latency and failure counters."""
+    return jsonify(notifier.status())
+
+@app.route('/api/monitor/status')
+@login_required
+def monitor_status_api():
+    return jsonify(monitor_status)
+
+# --- Prometheus Metrics ---
+PROMETHEUS_CONTAINER_METRICS = (
+    # (metric name, type, help, sample field, multiplier)
+    ('dockwatch_container_cpu_percent', 'gauge', 'CPU usage in percent of one core', 'cpu', 1),
+    ('dockwatch_container_memory_usage_bytes', 'gauge', 'Memory usage', 'memory_bytes', 1),
+    ('dockwatch_container_memory_limit_bytes', 'gauge', 'Memory limit', 'memory_limit_bytes', 1),
+    ('dockwatch_container_memory_percent', 'gauge', 'Memory usage in percent of the limit', 'mem_percent', 1),
+    ('dockwatch_container_network_receive_bytes_total', 'counter', 'Network bytes received', 'net_rx_bytes', 1),
+    ('dockwatch_container_network_transmit_bytes_total', 'counter', 'Network bytes sent', 'net_tx_bytes', 1),
+    ('dockwatch_container_blkio_read_bytes_total', 'counter', 'Block device bytes read', 'disk_read_bytes', 1),
+    ('dockwatch_container_blkio_write_bytes_total', 'counter', 'Block device bytes written', 'disk_write_bytes', 1),
+    ('dockwatch_container_network_receive_bytes_per_second', 'gauge', 'Network receive rate', 'net_rx_rate', 1),
+    ('dockwatch_container_network_transmit_bytes_per_second', 'gauge', 'Network transmit rate', 'net_tx_rate', 1),
+    ('dockwatch_container_blkio_read_bytes_per_second', 'gauge', 'Block device read rate', 'disk_read_rate', 1),
+    ('dockwatch_container_blkio_write_bytes_per_second', 'gauge', 'Block device write rate', 'disk_write_rate', 1),
+    ('dockwatch_container_last_sample_timestamp_seconds', 'gauge', 'Time of the latest stats sample', 'time', 1),
+)
+
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_family(lines, name, metric_type, help_text, samples):
+    """Append one metric family; ``samples`` is a list of (labels dict, value)."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        if labels:
+            label_str = ",".join(f'{k}="{prometheus_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of container stats and DockWatch internals.
+
+    Built from the stats hub's latest samples and in-process counters only; a scrape
+    never calls the Docker daemon. Containers appear once a collector is sampling them
+    (the monitor keeps one on every running container).
+    """
+    auth = request.headers.get('Authorization', '')
+    token_ok = METRICS_TOKEN and secrets.compare_digest(auth, f"Bearer {METRICS_TOKEN}")
+    if not token_ok and not current_user.is_authenticated:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    lines = []
+    containers = sorted(stats_hub.snapshot().items(), key=lambda item: item[1][0] or item[0])
+    for name, metric_type, help_text, field, scale in PROMETHEUS_CONTAINER_METRICS:
+        prometheus_family(lines, name, metric_type, help_text,
+                          [({'id': cid[:12], 'name': cname or cid[:12]}, round(sample[field] * scale, 3))
+                           for cid, (cname, sample) in containers])
+    prometheus_family(lines, 'dockwatch_stats_collectors', 'gauge', 'Containers with a live stats stream',
+                      [({}, len(containers))])
+
+    if monitor_status['last_sweep'] is not None:
+        prometheus_family(lines, 'dockwatch_monitor_sweep_duration_seconds', 'gauge',
+                          'Duration of the last monitoring sweep', [({}, monitor_status['sweep_duration'])])
+        prometheus_family(lines, 'dockwatch_monitor_last_sweep_timestamp_seconds', 'gauge',
+                          'Start time of the last monitoring sweep', [({}, monitor_status['last_sweep'])])
+        prometheus_family(lines, 'dockwatch_monitor_containers', 'gauge',
+                          'Running containers in the last monitoring sweep', [({}, monitor_status['containers'])])
+
+    status = notifier.status()
+    channels = sorted(status['channels'].items())
+    prometheus_family(lines, 'dockwatch_notification_queue_depth', 'gauge', 'Notifications waiting for delivery',
+                      [({}, status['queue_depth'])])
+    prometheus_family(lines, 'dockwatch_notification_queue_capacity', 'gauge', 'Notification queue size',
+                      [({}, status['queue_size'])])
+    prometheus_family(lines, 'dockwatch_notifications_dropped_total', 'counter',
+                      'Notifications dropped because the queue was full', [({}, status['dropped'])])
+    for field, help_text in (('sent', 'Notifications delivered'), ('failed', 'Notifications that failed after retries'),
+                             ('retries', 'Notification delivery retries')):
+        prometheus_family(lines, f'dockwatch_notifications_{field}_total', 'counter', help_text,
+                          [({'channel': ch}, st[field]) for ch, st in channels])
+    lines.append("# HELP dockwatch_notification_latency_seconds Latency of successful notification deliveries")
+    lines.append("# TYPE dockwatch_notification_latency_seconds summary")
+    for ch, st in channels:
+        lines.append(f'dockwatch_notification_latency_seconds_sum{{channel="{ch}"}} {round(st["latency_total_ms"] / 1000, 6)}')
+        lines.append(f'dockwatch_notification_latency_seconds_count{{channel="{ch}"}} {st["sent"]}')
+
+    open_streams, total_streams = sse_clients.snapshot()
+    prometheus_family(lines, 'dockwatch_sse_clients', 'gauge', 'Open SSE streams',
+                      [({'stream': kind}, n) for kind, n in sorted(open_streams.items())])
+    prometheus_family(lines, 'dockwatch_sse_connections_total', 'counter', 'SSE streams opened',
+                      [({'stream': kind}, n) for kind, n in sorted(total_streams.items())])
+
+    prometheus_family(lines, 'dockwatch_alert_rules_firing', 'gauge', 'Alert rule conditions currently firing',
+                      [({}, sum(1 for st in alert_rules.states() if st['firing']))])
+
+    return Response("\n".join(lines) + "\n", content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # --- Monitoring Logic ---
-last_alert_cooldown = {}
+class AlertCooldowns:
+    """Suppresses repeats of an alert until its entry expires.
 
-def send_notification(title, message):
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""SELECT slack_webhook, slack_enabled, discord_webhook, discord_enabled, 
-                     telegram_bot_token, telegram_chat_id, telegram_enabled, 
-                     generic_webhook, generic_enabled FROM alerts_config WHERE id=1""")
-        row = c.fetchone()
-        conn.close()
-        
-        if not row: 
+    Entries are keyed like ``<container id>_cpu`` and written through to the
+    alert_cooldowns table, so a restart picks up where it left off instead of
+    re-firing every active alert. Memory stays bounded on hosts with heavy
+    container churn: entries expire after ``ttl``, are dropped when their
+    container is destroyed, and the soonest-expiring ones are evicted beyond
+    ``max_entries``.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (container id, expires at)
+        self._lock = threading.Lock()
+
+    def load(self):
+        c = get_db().cursor()
+        c.execute("SELECT key, container_id, expires_at FROM alert_cooldowns WHERE expires_at > ?", (time.time(),))
+        with self._lock:
+            self._entries = {key: (cid, expires) for key, cid, expires in c.fetchall()}
+
+    def active(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return False
+            return True
+
+    def start(self, key, container_id, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (container_id, expires)
+            evicted = self._evict() if len(self._entries) > self.max_entries else []
+        conn = get_db()
+        conn.execute("INSERT OR REPLACE INTO alert_cooldowns (key, container_id, expires_at) VALUES (?, ?, ?)",
+                     (key, container_id, expires))
+        if evicted:
+            conn.executemany("DELETE FROM alert_cooldowns WHERE key=?", [(k,) for k in evicted])
+        conn.commit()
+
+    def _evict(self):
+        now = time.time()
+        evicted = [k for k, (_, expires) in self._entries.items() if expires <= now]
+        overflow = len(self._entries) - len(evicted) - self.max_entries
+        if overflow > 0:
+            live = [(expires, k) for k, (_, expires) in self._entries.items() if expires > now]
+            evicted += [k for _, k in heapq.nsmallest(overflow, live)]
+        for key in evicted:
+            del self._entries[key]
+        return evicted
+
+    def clear(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return
+        conn = get_db()
+        conn.execute("DELETE FROM alert_cooldowns WHERE key=?", (key,))
+        conn.commit()
+
+    def clear_prefix(self, prefix):
+        with self._lock:
+            keys = [k for k in self._entries if k.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        if not keys:
             return
+        conn = get_db()
+        conn.executemany("DELETE FROM alert_cooldowns WHERE key=?", [(k,) for k in keys])
+        conn.commit()
+
+    def forget_container(self, container_id):
+        with self._lock:
+            for key in [k for k, (cid, _) in self._entries.items() if cid == container_id]:
+                del self._entries[key]
+        conn = get_db()
+        conn.execute("DELETE FROM alert_cooldowns WHERE container_id=?", (container_id,))
+        conn.commit()
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+        conn = get_db()
+        conn.execute("DELETE FROM alert_cooldowns WHERE expires_at <= ?", (now,))
+        conn.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+alert_cooldowns = AlertCooldowns(ttl=ALERT_COOLDOWN, max_entries=ALERT_COOLDOWN_MAX)
+# Last sweep summary, exposed via /api/monitor/status
+monitor_status = {'last_sweep': None, 'sweep_duration': None, 'containers': 0,
+                  'workers': STATS_WORKERS, 'interval': MONITOR_INTERVAL}
+
+class NotificationDispatcher:
+    """Delivers notifications off the monitoring threads.
+
+    Alerts go into a bounded queue and never wait on the network. A dispatch
+    thread fans each message out to a bounded queue per enabled channel, and
+    each channel has its own worker threads posting over a pooled HTTP session,
+    retrying network errors, 429s and 5xx with exponential backoff. A slow or
+    dead endpoint only backs up its own queue, never the other channels.
+    """
+
+    CHANNELS = ('slack', 'discord', 'telegram', 'webhook')
+
+    def __init__(self, queue_size=1000, workers=2, retries=2, timeout=3):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.retries = retries
+        self.timeout = timeout
+        self.dropped = 0
+        self.sessions = {ch: requests.Session() for ch in self.CHANNELS}
+        self.channel_queues = {ch: queue.Queue(maxsize=queue_size) for ch in self.CHANNELS}
+        self.stats = {ch: {'sent': 0, 'failed': 0, 'retries': 0, 'dropped': 0, 'last_latency_ms': None,
+                           'avg_latency_ms': None, 'last_error': None} for ch in self.CHANNELS}
+        self._latency_total = {ch: 0.0 for ch in self.CHANNELS}
+        self._lock = threading.Lock()
+
+    def submit(self, title, message):
+        """Queue a notification; returns False (and counts a drop) when the queue is full."""
+        try:
+            self.queue.put_nowait((title, message))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            print(f"Notification queue full, dropped: {title}")
+            return False
+
+    def start(self):
+        threading.Thread(target=self._run, name='notify-dispatch', daemon=True).start()
+        for ch in self.CHANNELS:
+            for i in range(self.workers):
+                threading.Thread(target=self._channel_worker, args=(ch,),
+                                 name=f'notify-{ch}-{i}', daemon=True).start()
+
+    def _run(self):
+        while True:
+            title, message = self.queue.get()
+            try:
+                for ch, url, payload in self._deliveries(title, message):
+                    try:
+                        self.channel_queues[ch].put_nowait((url, payload))
+                    except queue.Full:
+                        with self._lock:
+                            self.stats[ch]['dropped'] += 1
+                        print(f"{ch.capitalize()} queue full, dropped: {title}")
+            except Exception as e:
+                print(f"Notification error: {e}")
+
+    def _channel_worker(self, channel):
+        q = self.channel_queues[channel]
+        while True:
+            url, payload = q.get()
+            try:
+                self._deliver(channel, url, payload)
+            except Exception as e:
+                print(f"Notification error: {e}")
+
+    def _deliveries(self, title, message):
+        config = alerts_config_cache.get()
+        if not config: 
+            return []
         
-        slack_url, slack_on, discord_url, discord_on, tg_token, tg_chat, tg_on, webhook_url, webhook_on = row
+        slack_url, slack_on = config['slack_webhook'], config['slack_enabled']
+        discord_url, discord_on = config['discord_webhook'], config['discord_enabled']
+        tg_token, tg_chat, tg_on = config['telegram_bot_token'], config['telegram_chat_id'], config['telegram_enabled']
+        webhook_url, webhook_on = config['generic_webhook'], config['generic_enabled']
         
         # Prioritize environment variables over database values for security
         slack_url = os.environ.get('SLACK_WEBHOOK_URL', slack_url)
@@ -918,119 +3219,465 @@ def send_notification(title, message):
         tg_chat = os.environ.get('TELEGRAM_CHAT_ID', tg_chat)
         webhook_url = os.environ.get('GENERIC_WEBHOOK_URL', webhook_url)
         
-        # Slack
+        deliveries = []
         if slack_on and slack_url:
-            try: 
-                requests.post(slack_url, json={"text": f"*{title}*\n{message}"}, timeout=3)
-            except Exception as e: 
-                print(f"Slack error: {e}")
-        
-        # Discord
+            deliveries.append(('slack', slack_url, {"text": f"*{title}*\n{message}"}))
         if discord_on and discord_url:
-            try:
-                requests.post(discord_url, json={"content": f"**{title}**\n{message}"}, timeout=3)
-            except Exception as e:
-                print(f"Discord error: {e}")
-        
-        # Telegram
+            deliveries.append(('discord', discord_url, {"content": f"**{title}**\n{message}"}))
         if tg_on and tg_token and tg_chat:
-            try:
-                tg_url = f"https://api.telegram.org/bot{tg_token}/sendMessage"
-                requests.post(tg_url, json={"chat_id": tg_chat, "text": f"*{title}*\n{message}", "parse_mode": "Markdown"}, timeout=3)
-            except Exception as e:
-                print(f"Telegram error: {e}")
-        
-        # Generic Webhook
+            tg_url = f"https://api.telegram.org/bot{tg_token}/sendMessage"
+            deliveries.append(('telegram', tg_url, {"chat_id": tg_chat, "text": f"*{title}*\n{message}", "parse_mode": "Markdown"}))
         if webhook_on and webhook_url:
-            try: 
-                requests.post(webhook_url, json={"title": title, "message": message, "timestamp": time.time()}, timeout=3)
+            deliveries.append(('webhook', webhook_url, {"title": title, "message": message, "timestamp": time.time()}))
+        return deliveries
+
+    def _deliver(self, channel, url, payload):
+        stats = self.stats[channel]
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    stats['retries'] += 1
+            started = time.time()
+            retry_after = None
+            try:
+                r = self.sessions[channel].post(url, json=payload, timeout=self.timeout)
+                if r.status_code < 400:
+                    latency = (time.time() - started) * 1000
+                    with self._lock:
+                        stats['sent'] += 1
+                        self._latency_total[channel] += latency
+                        stats['last_latency_ms'] = round(latency, 1)
+                        stats['avg_latency_ms'] = round(self._latency_total[channel] / stats['sent'], 1)
+                    return True
+                error = f"HTTP {r.status_code}"
+                if r.status_code != 429 and r.status_code < 500:
+                    break  # Bad URL/token or payload; retrying won't help
+                retry_after = r.headers.get('Retry-After')
             except Exception as e:
-                print(f"Webhook error: {e}")
-                
-    except Exception as e:
-        print(f"Notification error: {e}")
+                error = str(e)
+            if attempt < self.retries:
+                delay = 2 ** attempt
+                if retry_after:
+                    try:
+                        delay = min(float(retry_after), 30)
+                    except ValueError:
+                        pass
+                time.sleep(delay)
+        with self._lock:
+            stats['failed'] += 1
+            stats['last_error'] = error
+        print(f"{channel.capitalize()} error: {error}")
+        return False
+
+    def status(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_size': self.queue.maxsize,
+                'dropped': self.dropped,
+                'channels': {ch: dict(st, queue_depth=self.channel_queues[ch].qsize(),
+                                      latency_total_ms=round(self._latency_total[ch], 1))
+                             for ch, st in self.stats.items()}
+            }
+
+notifier = NotificationDispatcher(queue_size=NOTIFY_QUEUE_SIZE, workers=NOTIFY_WORKERS,
+                                  retries=NOTIFY_RETRIES, timeout=NOTIFY_TIMEOUT)
+
+def send_notification(title, message):
+    return notifier.submit(title, message)
 
 def log_alert(level, message, container_name="System"):
     try:
         # DB Log
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db()
         c = conn.cursor()
         c.execute("INSERT INTO alert_history (level, message, container) VALUES (?, ?, ?)", 
                   (level, message, container_name))
         conn.commit()
-        conn.close()
         # Notify
         send_notification(f"[{level}] {container_name}", message)
     except: pass
 
+class AlertCoalescer:
+    """Groups bursts of container state alerts into one digest notification.
+
+    The first event opens a window; when it closes, every event in it is written to
+    alert_history in a single transaction and summarised in one notification, grouped
+    per container or per compose stack. A compose restart of 50 services is then
+    one Slack post instead of 200.
+    """
+
+    def __init__(self, window=10, digest_max=20, group_by='container'):
+        self.window = window
+        self.digest_max = digest_max
+        self.group_by = group_by
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def add(self, level, message, container_name, event_type, stack=None):
+        if self.window <= 0:
+            log_alert(level, message, container_name)
+            return
+        with self._lock:
+            self._pending.append((time.time(), level, message, container_name, event_type, stack))
+        self._wakeup.set()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.window)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Alert flush error: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        conn = get_db()
+        conn.executemany("INSERT INTO alert_history (timestamp, level, message, container) VALUES (?, ?, ?, ?)",
+                         [(datetime.datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'), level, message, name)
+                          for ts, level, message, name, _, _ in pending])
+        conn.commit()
+
+        if len(pending) == 1:
+            _, level, message, name, _, _ = pending[0]
+            send_notification(f"[{level}] {name}", message)
+            return
+
+        # group -> {event type: count}, in first-seen order
+        groups = {}
+        for _, _, _, name, event_type, stack in pending:
+            key = stack if self.group_by == 'stack' and stack else name
+            counts = groups.setdefault(key, {})
+            counts[event_type] = counts.get(event_type, 0) + 1
+
+        lines = []
+        for key, counts in list(groups.items())[:self.digest_max]:
+            summary = ", ".join(f"{event_type} x{n}" if n > 1 else event_type for event_type, n in counts.items())
+            lines.append(f"{key}: {summary}")
+        if len(groups) > self.digest_max:
+            lines.append(f"...and {len(groups) - self.digest_max} more")
+
+        unit = 'stacks' if self.group_by == 'stack' else 'containers'
+        send_notification(f"[State Change] {len(pending)} events across {len(groups)} {unit}", "\n".join(lines))
+
+alert_coalescer = AlertCoalescer(window=ALERT_COALESCE_WINDOW, digest_max=ALERT_DIGEST_MAX,
+                                 group_by=ALERT_COALESCE_BY)
+
+# --- Alert Rules ---
+# Sample fields a rule expression may use, plus derived sums
+RULE_METRICS = ('cpu', 'memory', 'memory_limit', 'mem_percent', 'net_rx', 'net_tx',
+                'disk_read', 'disk_write', 'net_rx_rate', 'net_tx_rate',
+                'disk_read_rate', 'disk_write_rate', 'net_rate', 'io_rate')
+RULE_OPERATORS = {'>': lambda v, t: v > t, '>=': lambda v, t: v >= t,
+                  '<': lambda v, t: v < t, '<=': lambda v, t: v <= t}
+RULE_FIRING_TTL = 86400  # seconds a firing rule stays marked without resolving
+_RULE_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant,
+               ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd)
+
+def compile_rule_expression(expression):
+    """Compile an arithmetic expression over RULE_METRICS, e.g. ``net_rate / 1048576``.
+
+    Only numbers, metric names, + - * / and parentheses are accepted; anything else
+    raises ValueError. The compiled code is evaluated with the sample as its namespace.
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        raise ValueError(f"Invalid expression: {expression}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _RULE_NODES):
+            raise ValueError(f"Unsupported syntax in expression: {expression}")
+        if isinstance(node, ast.Name) and node.id not in RULE_METRICS:
+            raise ValueError(f"Unknown metric '{node.id}' (expected one of {', '.join(RULE_METRICS)})")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants are allowed: {expression}")
+    return compile(tree, '<rule>', 'eval')
+
+def parse_label_selector(selector):
+    """'key=value,other' -> {'key': 'value', 'other': None}; None matches any value."""
+    labels = {}
+    for part in (selector or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        key, _, value = part.partition('=')
+        labels[key.strip()] = value.strip() if _ else None
+    return labels
+
+class AlertRule:
+    """One alert_rules row with its expression compiled and selector parsed."""
+
+    FIELDS = ('id', 'name', 'enabled', 'container_pattern', 'label_selector', 'expression',
+              'operator', 'threshold', 'clear_threshold', 'for_seconds', 'level', 'notify_recovery')
+
+    def __init__(self, row):
+        for field, value in zip(self.FIELDS, row):
+            setattr(self, field, value)
+        if self.operator not in RULE_OPERATORS:
+            raise ValueError(f"Unknown operator '{self.operator}'")
+        self.code = compile_rule_expression(self.expression)
+        self.labels = parse_label_selector(self.label_selector)
+        self.fires = RULE_OPERATORS[self.operator]
+        # Hysteresis: once firing, the rule clears only when the value crosses
+        # clear_threshold (defaults to the threshold itself)
+        clear_at = self.threshold if self.clear_threshold is None else self.clear_threshold
+        self.holds = lambda value: RULE_OPERATORS[self.operator](value, clear_at)
+
+    def matches(self, name, labels):
+        if not fnmatch.fnmatchcase(name, self.container_pattern or '*'):
+            return False
+        for key, value in self.labels.items():
+            if key not in labels or (value is not None and labels[key] != value):
+                return False
+        return True
+
+    def evaluate(self, namespace):
+        return eval(self.code, {'__builtins__': {}}, namespace)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+class AlertRuleEngine:
+    """Evaluates alert rules incrementally on the shared stats samples.
+
+    Runs inside StatsHub._publish for monitor-pinned collectors, so it needs no Docker
+    calls of its own and only runs in the monitor owner process. Which rules apply
+    to a container is resolved once per container (labels never change for a given
+    id), so a sample costs one compiled expression per matching rule.
+
+    Per (rule, container) the engine tracks when the condition started holding;
+    the rule fires once it has held for ``for_seconds`` and resolves, with an
+    optional recovery notification, once the value crosses back over
+    ``clear_threshold``.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl  # reload interval, for rules saved by another process
+        self._rules = None
+        self._loaded = 0
+        self._matches = {}  # container id -> [AlertRule]
+        self._state = {}  # (rule id, container id) -> {'since', 'firing', 'value', 'name'}
+        self._lock = threading.Lock()
+
+    def rules(self):
+        if self._rules is None or time.time() - self._loaded > self.ttl:
+            c = get_db().cursor()
+            c.execute(f"SELECT {', '.join(AlertRule.FIELDS)} FROM alert_rules WHERE enabled=1")
+            rules = []
+            for row in c.fetchall():
+                try:
+                    rules.append(AlertRule(row))
+                except ValueError as e:
+                    print(f"Skipping alert rule {row[0]}: {e}")
+            with self._lock:
+                self._rules = rules
+                self._loaded = time.time()
+                self._matches = {}
+                live = {r.id for r in rules}
+                self._state = {k: v for k, v in self._state.items() if k[0] in live}
+        return self._rules
+
+    def invalidate(self):
+        self._rules = None
+
+    def _rules_for(self, container_id, name):
+        rules = self.rules()
+        matched = self._matches.get(container_id)
+        if matched is None:
+            summary = container_inventory.get(container_id)
+            labels = summary['labels'] if summary else {}
+            matched = [r for r in rules if r.matches(name, labels)]
+            self._matches[container_id] = matched
+        return matched
+
+    def observe(self, container_id, name, sample):
+        try:
+            rules = self._rules_for(container_id, name)
+        except Exception as e:
+            print(f"Alert rule load error: {e}")
+            return
+        if not rules:
+            return
+        now = sample['time']
+        namespace = dict(sample)
+        namespace['net_rate'] = sample['net_rx_rate'] + sample['net_tx_rate']
+        namespace['io_rate'] = sample['disk_read_rate'] + sample['disk_write_rate']
+        for rule in rules:
+            try:
+                value = rule.evaluate(namespace)
+            except (ZeroDivisionError, KeyError, TypeError):
+                continue
+            key = (rule.id, container_id)
+            cooldown_key = f"{container_id}_rule{rule.id}"
+            # Still marked as firing from before a restart: pick the alert up where it was
+            restored = key not in self._state and alert_cooldowns.active(cooldown_key)
+            with self._lock:
+                state = self._state.get(key)
+                if state is None:
+                    if restored:
+                        state = self._state[key] = {'since': now, 'firing': True, 'name': name}
+                    elif not rule.fires(value, rule.threshold):
+                        continue
+                    else:
+                        state = self._state[key] = {'since': now, 'firing': False, 'name': name}
+                state['value'] = value
+                if state['firing']:
+                    resolved = not rule.holds(value)
+                    if resolved:
+                        del self._state[key]
+                    fire = False
+                else:
+                    resolved = False
+                    if not rule.fires(value, rule.threshold):
+                        # Dropped back below before the sustain window elapsed
+                        del self._state[key]
+                        continue
+                    fire = now - state['since'] >= (rule.for_seconds or 0)
+                    if fire:
+                        state['firing'] = True
+            if fire:
+                held = f" for {int(now - state['since'])}s" if rule.for_seconds else ""
+                log_alert(rule.level or "Rule",
+                          f"{rule.name}: {rule.expression} = {round(value, 2)} {rule.operator} {rule.threshold}{held}", name)
+                # Held until the rule resolves (or its container's stream ends); the expiry
+                # only bounds entries whose resolve was missed
+                alert_cooldowns.start(cooldown_key, container_id, ttl=RULE_FIRING_TTL)
+            elif resolved:
+                alert_cooldowns.clear(cooldown_key)
+                if rule.notify_recovery:
+                    log_alert("Resolved", f"{rule.name}: {rule.expression} = {round(value, 2)}", name)
+
+    def forget(self, container_id):
+        """Drop per-container state once its stats stream ends.
+
+        The firing markers go too: with no state left, nothing would observe the
+        recovery that clears them, and they would suppress the next real breach.
+        """
+        with self._lock:
+            self._matches.pop(container_id, None)
+            for key in [k for k in self._state if k[1] == container_id]:
+                del self._state[key]
+        alert_cooldowns.clear_prefix(f"{container_id}_rule")
+
+    def states(self):
+        with self._lock:
+            return [{'rule_id': rule_id, 'container_id': cid, 'container': state['name'],
+                     'since': state['since'], 'firing': state['firing'], 'value': state['value']}
+                    for (rule_id, cid), state in self._state.items()]
+
+alert_rules = AlertRuleEngine()
+
+def fetch_container_usage(container_id):
+    """One-shot stats sample for a container that has no shared collector sample yet."""
+    return calculate_stats(client.api.stats(container_id, stream=False))
+
 def monitor_loop():
+    # stats(stream=False) blocks ~1-2s per container while the daemon samples precpu,
+    # so containers without a shared collector sample are fetched over a bounded pool.
+    pool = ThreadPoolExecutor(max_workers=STATS_WORKERS, thread_name_prefix='stats')
     while True:
+        sweep_start = time.time()
         try:
             if not client: 
                 time.sleep(10)
                 continue
                 
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute("SELECT cpu_limit, mem_limit FROM alerts_config WHERE id=1")
-            row = c.fetchone()
-            conn.close()
-            
-            if not row:
-                time.sleep(30)
+            config = alerts_config_cache.get()
+            if not config:
+                time.sleep(MONITOR_INTERVAL)
                 continue
             
-            cpu_thresh, mem_thresh = row
+            cpu_thresh, mem_thresh = config['cpu_limit'], config['mem_limit']
+            # Throughput limits in MB/s; 0 disables
+            net_thresh, io_thresh = config['net_limit'] or 0, config['io_limit'] or 0
             
-            containers = client.containers.list()
+            if not container_inventory.seeded:
+                container_inventory.seed()
+            containers = container_inventory.running()
+            # Keep a shared collector on every running container; the sweep reads their
+            # latest samples and only falls back to one-shot stats() while one warms up.
+            stats_hub.track({c['id']: c['name'] for c in containers})
+            usage = {}
+            cold = []
             for c in containers:
+                sample = stats_hub.latest(c['id'], max_age=MONITOR_INTERVAL)
+                if sample is None:
+                    cold.append(c['id'])
+                else:
+                    usage[c['id']] = sample
+            futures = {pool.submit(fetch_container_usage, cid): cid for cid in cold}
+            for future in as_completed(futures):
                 try:
-                    stats = c.stats(stream=False)
-                    # CPU
-                    cpu_stats = stats['cpu_stats']
-                    precpu_stats = stats['precpu_stats']
-                    cpu_percent = 0.0
-                    
-                    cpu_usage = cpu_stats['cpu_usage']['total_usage']
-                    precpu_usage = precpu_stats['cpu_usage']['total_usage']
-                    system_usage = cpu_stats.get('system_cpu_usage', 0)
-                    presystem_usage = precpu_stats.get('system_cpu_usage', 0)
-                    
-                    if system_usage > 0 and presystem_usage > 0:
-                        cpu_delta = cpu_usage - precpu_usage
-                        system_delta = system_usage - presystem_usage
-                        if system_delta > 0 and cpu_delta > 0:
-                            online_cpus = cpu_stats.get('online_cpus', 1) or 1
-                            cpu_percent = (cpu_delta / system_delta) * online_cpus * 100.0
-                            
-                    # Mem
-                    mem_usage = stats['memory_stats'].get('usage', 0)
-                    mem_limit = stats['memory_stats'].get('limit', 0)
-                    mem_percent = 0.0
-                    if mem_limit > 0: mem_percent = (mem_usage / mem_limit) * 100.0
+                    usage[futures[future]] = future.result()
+                except: pass
+
+            for c in containers:
+                sample = usage.get(c['id'])
+                if sample is None:
+                    continue
+                try:
+                    cpu_percent = sample['cpu']
+                    mem_percent = sample['mem_percent']
                     
                     # Alerts
-                    uid = c.id
-                    now = time.time()
+                    uid = c['id']
                     
                     if cpu_percent > cpu_thresh:
                         key = f"{uid}_cpu"
-                        if now - last_alert_cooldown.get(key, 0) > 300: # 5 min cooldown
-                            log_alert("High CPU", f"CPU: {round(cpu_percent,1)}% > {cpu_thresh}%", c.name)
-                            last_alert_cooldown[key] = now
+                        if not alert_cooldowns.active(key):
+                            log_alert("High CPU", f"CPU: {round(cpu_percent,1)}% > {cpu_thresh}%", c['name'])
+                            alert_cooldowns.start(key, uid)
                             
                     if mem_percent > mem_thresh:
                         key = f"{uid}_mem"
-                        if now - last_alert_cooldown.get(key, 0) > 300:
-                            log_alert("High Memory", f"Mem: {round(mem_percent,1)}% > {mem_thresh}%", c.name)
-                            last_alert_cooldown[key] = now
+                        if not alert_cooldowns.active(key):
+                            log_alert("High Memory", f"Mem: {round(mem_percent,1)}% > {mem_thresh}%", c['name'])
+                            alert_cooldowns.start(key, uid)
+
+                    net_rate = (sample['net_rx_rate'] + sample['net_tx_rate']) / 1024 / 1024
+                    if net_thresh and net_rate > net_thresh:
+                        key = f"{uid}_net"
+                        if not alert_cooldowns.active(key):
+                            log_alert("High Network", f"Net: {round(net_rate,1)} MB/s > {net_thresh} MB/s", c['name'])
+                            alert_cooldowns.start(key, uid)
+
+                    io_rate = (sample['disk_read_rate'] + sample['disk_write_rate']) / 1024 / 1024
+                    if io_thresh and io_rate > io_thresh:
+                        key = f"{uid}_io"
+                        if not alert_cooldowns.active(key):
+                            log_alert("High Disk I/O", f"Disk: {round(io_rate,1)} MB/s > {io_thresh} MB/s", c['name'])
+                            alert_cooldowns.start(key, uid)
                             
                 except: pass
             
+            duration = time.time() - sweep_start
+            monitor_status.update({
+                'last_sweep': sweep_start,
+                'sweep_duration': round(duration, 3),
+                'containers': len(containers),
+                'workers': STATS_WORKERS,
+                'interval': MONITOR_INTERVAL
+            })
+            if duration > MONITOR_INTERVAL:
+                print(f"Monitor sweep took {duration:.1f}s for {len(containers)} containers "
+                      f"(interval {MONITOR_INTERVAL}s, workers {STATS_WORKERS})")
+            
         except Exception as e:
             print(f"Monitor error: {e}")
             
-        time.sleep(30) # Check every 30s
+        # Keep the cadence: only sleep for whatever is left of the interval
+        time.sleep(max(1, MONITOR_INTERVAL - (time.time() - sweep_start)))
 
 def event_listener_loop():
     while True:
@@ -1039,26 +3686,89 @@ def event_listener_loop():
                time.sleep(10)
                continue
             
+            # The events connection is opened before seeding, so nothing is missed in between.
+            # Every reconnect re-seeds the inventory because events may have been dropped.
+            events = client.events(decode=True)
+            image_tag_cache.invalidate()
+            layer_index.invalidate()
+            container_inventory.seed()
+
             # This blocks
-            for event in client.events(decode=True):
-                if event.get('Type') == 'container':
+            for event in events:
+                if event.get('Type') == 'image':
+                    image_tag_cache.invalidate()
+                    layer_index.invalidate()
+                elif event.get('Type') == 'container':
+                    container_inventory.handle_event(event)
                     status = event.get('status')
-                    if status in ['die', 'kill', 'stop', 'start']:
-                        name = event.get('Actor', {}).get('Attributes', {}).get('name', 'Unknown')
-                        log_alert("State Change", f"Container {status}", name)
+                    if background_owner and (event.get('Action') or status) == 'destroy':
+                        alert_cooldowns.forget_container(event.get('id') or event.get('Actor', {}).get('ID'))
+                    # Every process keeps its inventory current; only the monitor owner alerts
+                    if background_owner and status in ['die', 'kill', 'stop', 'start']:
+                        attributes = event.get('Actor', {}).get('Attributes', {})
+                        name = attributes.get('name', 'Unknown')
+                        alert_coalescer.add("State Change", f"Container {status}", name, status,
+                                            attributes.get('com.docker.compose.project'))
         except:
              time.sleep(5)
 
-# Start Threads
+# --- Background Workers ---
+# DockWatch runs as a single process (see serve.py); jobs, samples and counters live in
+# memory. The monitors that alert and write shared state are still guarded by a flock
+# on config/background.lock, so a second process started by mistake (or an overlapping
+# restart) does not alert twice: it waits and takes over when the owner exits.
+background_owner = False
+_background_lock = None
+
+def acquire_background_lock():
+    global _background_lock
+    if fcntl is None:
+        return True  # no flock (Windows): single-process deployments only
+    fd = open(os.path.join(CONFIG_DIR, 'background.lock'), 'w')
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fd.close()
+        return False
+    _background_lock = fd  # held until the process exits
+    return True
+
+def start_monitors():
+    global background_owner
+    background_owner = True
+    try:
+        alert_cooldowns.load()
+    except Exception as e:
+        print(f"Alert cooldown load error: {e}")
+    threading.Thread(target=monitor_loop, daemon=True).start()
+    threading.Thread(target=metrics_flush_loop, daemon=True).start()
+    threading.Thread(target=history_maintenance_loop, daemon=True).start()
+    if TRIVY_NIGHTLY_HOUR >= 0:
+        threading.Thread(target=nightly_scan_loop, daemon=True).start()
+
+def claim_monitors_loop():
+    # Take over if the owning process exits (the kernel releases its lock)
+    while not acquire_background_lock():
+        time.sleep(30)
+    start_monitors()
+
+def start_background_workers():
+    notifier.start()
+    trivy_scanner.start()
+    alert_coalescer.start()
+    threading.Thread(target=event_listener_loop, daemon=True).start()
+    if acquire_background_lock():
+        start_monitors()
+    else:
+        threading.Thread(target=claim_monitors_loop, daemon=True).start()
+
 # Start monitoring threads (avoid duplicate in Flask reloader)
 if not os.environ.get("WERKZEUG_RUN_MAIN") or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
-    t1 = threading.Thread(target=monitor_loop, daemon=True)
-    t1.start()
-    t2 = threading.Thread(target=event_listener_loop, daemon=True)
-    t2.start()
+    start_background_workers()
 
 
 if __name__ == '__main__':
+    # Development server; use serve.py for production
     init_db()
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=True)
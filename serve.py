@@ -0,0 +1,44 @@
+"""Production entry point for DockWatch.
+
+DOCKWATCH_SERVER selects the worker model:
+  gevent   (default) gevent WSGI server; each request and SSE stream is a greenlet,
+           so hundreds of long-lived stats/log streams don't need a thread each.
+  threaded Werkzeug's threaded server without the debugger or reloader.
+
+Run exactly one DockWatch process. Export and scan jobs, live stats samples and the
+/metrics counters are kept in memory, so several worker processes (e.g. gunicorn -w 4)
+would each see only part of that state.
+"""
+import os
+
+SERVER = os.environ.get('DOCKWATCH_SERVER', 'gevent')
+
+if SERVER == 'gevent':
+    # Must happen before app (and docker/requests) import sockets and threading
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import app  # noqa: E402  (importing starts the background workers)
+
+
+def main():
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', 8080))
+
+    if SERVER == 'gevent':
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+        max_connections = int(os.environ.get('MAX_CONNECTIONS', 1000))
+        server = WSGIServer((host, port), app, spawn=Pool(max_connections))
+        print(f"DockWatch (gevent, max {max_connections} connections) listening on {host}:{port}")
+        server.serve_forever()
+    elif SERVER == 'threaded':
+        from werkzeug.serving import run_simple
+        print(f"DockWatch (threaded) listening on {host}:{port}")
+        run_simple(host, port, app, threaded=True, use_reloader=False, use_debugger=False)
+    else:
+        raise SystemExit(f"Unknown DOCKWATCH_SERVER '{SERVER}' (expected gevent or threaded)")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,8 +19,10 @@ function filterAlerts() {
         renderAlerts(allAlerts);
         return;
     }
-    const filtered = allAlerts.filter(e => e.timestamp.startsWith(dateInput));
-    renderAlerts(filtered);
+    // Filter on the server so days older than the latest 100 alerts are reachable
+    fetch(`/api/alerts/history?from=${dateInput}&to=${dateInput}&limit=1000`)
+        .then(r => r.json())
+        .then(data => renderAlerts(data));
 }
 
 function testNotification() {
@@ -32,6 +32,8 @@ function openSettings() {
     fetch('/api/alerts/config').then(r => r.json()).then(data => {
         document.getElementById('conf-cpu').value = data.cpu_limit || 80;
         document.getElementById('conf-mem').value = data.mem_limit || 90;
+        document.getElementById('conf-net').value = data.net_limit || 0;
+        document.getElementById('conf-io').value = data.io_limit || 0;
 
         // Slack
         document.getElementById('conf-slack').value = data.slack_webhook || '';
@@ -67,6 +69,8 @@ function setTheme(theme) {
 function saveAlertSettings() {
     const cpuLimit = parseInt(document.getElementById('conf-cpu').value);
     const memLimit = parseInt(document.getElementById('conf-mem').value);
+    const netLimit = parseInt(document.getElementById('conf-net').value) || 0;
+    const ioLimit = parseInt(document.getElementById('conf-io').value) || 0;
 
     // Validate limits
     if (cpuLimit < 1 || cpuLimit > 100) {
@@ -116,6 +120,8 @@ function saveAlertSettings() {
     const payload = {
         cpu_limit: cpuLimit,
         mem_limit: memLimit,
+        net_limit: netLimit,
+        io_limit: ioLimit,
         slack_webhook: slackWebhook,
         slack_enabled: slackEnabled ? 1 : 0,
         discord_webhook: discordWebhook,
@@ -1,7 +1,7 @@
 let allImages = [];
 
-// Load Images
-fetch('/api/images')
+// Load Images (labels are not shown, so skip them)
+fetch('/api/images?fields=id,long_id,tags,size_mb,created')
     .then(r => r.json())
     .then(data => {
         allImages = data;
@@ -41,6 +41,16 @@ function selectImage(img, el) {
     document.getElementById('selected-image-tag').textContent = img.tags[0];
     document.getElementById('selected-image-id').textContent = img.id;
     document.getElementById('history-view').textContent = 'Loading...';
+    document.getElementById('history-summary').textContent = '';
+
+    fetch(`/api/images/history/${img.long_id}?summary=1`)
+        .then(r => r.json())
+        .then(s => {
+            if (s.error) return;
+            let text = `${s.layers} layers, ${(s.size / 1048576).toFixed(1)} MB`;
+            if (s.shared_size !== null) text += ` (${(s.shared_size / 1048576).toFixed(1)} MB shared with other images)`;
+            document.getElementById('history-summary').textContent = text;
+        });
 
     // Fetch History
     fetch(`/api/images/history/${img.long_id}`)
@@ -33,8 +33,9 @@ function updateCharts(data) {
     };
     pushData(cpuChart, now, data.cpu); document.getElementById('cpu-text').innerText = data.cpu + '%';
     pushData(memChart, now, data.memory); document.getElementById('mem-text').innerText = data.memory + ' MB / ' + data.memory_limit + ' MB';
-    pushData(netChart, now, [data.net_rx, data.net_tx]); document.getElementById('net-text').innerHTML = `↓${data.net_rx} MB <span style="color:#484f58">|</span> ↑${data.net_tx} MB`;
-    pushData(diskChart, now, [data.disk_read, data.disk_write]); document.getElementById('disk-text').innerHTML = `R:${data.disk_read} MB <span style="color:#484f58">|</span> W:${data.disk_write} MB`;
+    const kb = v => Math.round(v / 1024);
+    pushData(netChart, now, [kb(data.net_rx_rate), kb(data.net_tx_rate)]); document.getElementById('net-text').innerHTML = `↓${kb(data.net_rx_rate)} KB/s <span style="color:#484f58">|</span> ↑${kb(data.net_tx_rate)} KB/s`;
+    pushData(diskChart, now, [kb(data.disk_read_rate), kb(data.disk_write_rate)]); document.getElementById('disk-text').innerHTML = `R:${kb(data.disk_read_rate)} KB/s <span style="color:#484f58">|</span> W:${kb(data.disk_write_rate)} KB/s`;
 }
 
 function selectContainer(el) {
@@ -63,18 +64,31 @@ function selectContainer(el) {
     if (currentLogSource) currentLogSource.close();
     if (currentStatSource) currentStatSource.close();
 
-    currentLogSource = new EventSource(`/api/logs/${id}`);
+    // Batched mode: each message carries several lines, one per SSE data: field
+    currentLogSource = new EventSource(`/api/logs/${id}?batch=1`);
     currentLogSource.onmessage = function (event) {
         if (logView.innerHTML.includes('Connecting...')) logView.innerHTML = '';
-        const div = document.createElement('div');
-        div.className = 'log-line';
-        div.textContent = event.data;
         const query = document.getElementById('log-search').value.toLowerCase();
-        if (query && !event.data.toLowerCase().includes(query)) div.classList.add('hidden-by-filter');
-        logView.appendChild(div);
-        if (logView.childElementCount > 2000) logView.removeChild(logView.firstChild);
+        const fragment = document.createDocumentFragment();
+        event.data.split('\n').forEach(line => {
+            const div = document.createElement('div');
+            div.className = 'log-line';
+            div.textContent = line;
+            if (query && !line.toLowerCase().includes(query)) div.classList.add('hidden-by-filter');
+            fragment.appendChild(div);
+        });
+        logView.appendChild(fragment);
+        while (logView.childElementCount > 2000) logView.removeChild(logView.firstChild);
         if (autoScroll) logView.scrollTop = logView.scrollHeight;
     };
+    currentLogSource.addEventListener('dropped', function (event) {
+        const info = JSON.parse(event.data);
+        const div = document.createElement('div');
+        div.className = 'log-line';
+        div.style.color = 'var(--danger)';
+        div.textContent = `... ${info.new} lines skipped to keep up (${info.dropped} total)`;
+        logView.appendChild(div);
+    });
 
     if (showStats) fetchVolumeUsage(id);
 
@@ -97,17 +111,22 @@ function handleStoppedState() {
     document.getElementById('stats-overlay').style.display = 'flex';
 }
 
-function fetchVolumeUsage(id) {
-    document.getElementById('vol-text').textContent = 'Calculating...';
-    document.getElementById('vol-details').innerHTML = '';
-    fetch(`/api/volume/${id}`).then(r => r.json()).then(data => {
+function fetchVolumeUsage(id, attempt = 0) {
+    if (attempt === 0) {
+        document.getElementById('vol-text').textContent = 'Calculating...';
+        document.getElementById('vol-details').innerHTML = '';
+    }
+    // async=1 answers from the server-side cache at once; poll while mounts are still being measured
+    fetch(`/api/volume/${id}?async=1`).then(r => r.json()).then(data => {
         if (data.error) { document.getElementById('vol-text').textContent = 'Error'; return; }
         if (data.status === 'stopped') { document.getElementById('vol-text').textContent = 'N/A (Stopped)'; return; }
-        document.getElementById('vol-text').textContent = data.total_mb + ' MB';
+        const pending = (data.mounts || []).some(m => m.pending);
+        document.getElementById('vol-text').textContent = pending && data.total_mb === 0 ? 'Calculating...' : data.total_mb + ' MB';
         let html = '';
-        if (data.mounts && data.mounts.length > 0) { data.mounts.forEach(m => { html += `<div>${m.path}: ${m.size_mb || '?'} MB</div>`; }); }
+        if (data.mounts && data.mounts.length > 0) { data.mounts.forEach(m => { html += m.error ? `<div>${m.path}: unavailable</div>` : `<div>${m.path}: ${m.pending ? '…' : (m.size_mb ?? '?')} MB</div>`; }); }
         else { html = 'No binds/volumes found.'; }
         document.getElementById('vol-details').innerHTML = html;
+        if (pending && attempt < 15 && document.getElementById('selected-id').textContent === id.substring(0, 12)) setTimeout(() => fetchVolumeUsage(id, attempt + 1), 2000);
     }).catch(e => { document.getElementById('vol-text').textContent = 'Error'; });
 }
 
@@ -159,5 +178,26 @@ function filterLogs() {
 function exportLogs(fmt) {
     const id = document.querySelector('.container-item.active').getAttribute('data-id');
     if (!id) return;
+    if (fmt === 'pdf') { exportPdf(id); return; }
     window.location.href = `/api/export/${id}?format=${fmt}`;
 }
+
+function exportPdf(id) {
+    // PDFs are rendered by a background job; poll it and download when done
+    showToast('Generating PDF...', 'info');
+    fetch(`/api/export/${id}/pdf`, { method: 'POST' }).then(r => r.json()).then(job => {
+        if (job.error) { showToast('PDF export failed: ' + job.error, 'error'); return; }
+        const poll = setInterval(() => {
+            fetch(`/api/export/jobs/${job.id}`).then(r => r.json()).then(status => {
+                if (status.status === 'done') {
+                    clearInterval(poll);
+                    if (status.truncated) showToast('PDF was truncated to the export limits', 'info');
+                    window.location.href = `/api/export/jobs/${job.id}/download`;
+                } else if (status.status === 'error' || status.error) {
+                    clearInterval(poll);
+                    showToast('PDF export failed: ' + status.error, 'error');
+                }
+            }).catch(() => clearInterval(poll));
+        }, 1000);
+    }).catch(e => showToast('PDF export failed: ' + e.message, 'error'));
+}
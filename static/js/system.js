@@ -19,11 +19,27 @@ fetch('/api/system/info')
         document.getElementById('version-json').textContent = JSON.stringify(data.version, null, 2);
         renderVersionTable(data.version);
 
-        // Render DF
-        document.getElementById('df-json').textContent = JSON.stringify(data.df, null, 2);
-        renderDFTable(data.df);
+        renderDF(data.df, data.df_age);
     });
 
+function renderDF(df, age) {
+    document.getElementById('df-json').textContent = JSON.stringify(df, null, 2);
+    renderDFTable(df);
+    // The server shares one cached df snapshot between pages
+    document.getElementById('df-age').textContent = age ? `(as of ${Math.round(age)}s ago)` : '';
+}
+
+function refreshDiskUsage() {
+    document.getElementById('df-age').textContent = '(refreshing...)';
+    fetch('/api/system/df/refresh', { method: 'POST' })
+        .then(r => r.json())
+        .then(df => {
+            if (df.error) { showToast("Error: " + df.error, 'error'); return; }
+            renderDF(df, 0);
+        })
+        .catch(e => showToast("Error: " + e, 'error'));
+}
+
 // Fetch Events (Alerts History)
 fetch('/api/alerts/history')
     .then(r => r.json())